@@ -0,0 +1,331 @@
+"""Offline benchmarks for the Stylish Name Bot.
+
+Two suites, neither needs a Telegram token or network access:
+
+    python benchmark.py micro      # rendering microbenchmarks
+    python benchmark.py replay     # replay updates through the real Application
+    python benchmark.py            # both
+
+The replay suite starts a local fake of the Bot API endpoints the bot uses
+(getMe, getUpdates, sendMessage, sendDocument, editMessageText,
+answerCallbackQuery, answerInlineQuery, deleteMessage(s)), points the real Application at it with
+polling, feeds it a synthetic update stream (or a recorded one with
+--updates FILE, one Update JSON object per line) and reports handler latency
+percentiles and updates per second.
+"""
+import os
+
+# Benchmark the bot's own code path, not Telegram's flood limits
+os.environ.setdefault('GLOBAL_SEND_RATE', '1000000')
+os.environ.setdefault('CHAT_SEND_RATE', '1000000')
+os.environ.setdefault('GROUP_SEND_RATE', '1000000')
+# Keep benchmark favorites and history out of the real database
+os.environ.setdefault('USER_DB', ':memory:')
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import timeit
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import TypeHandler
+
+import stylish_name_bot as bot_module
+
+logger = logging.getLogger(__name__)
+
+FAKE_TOKEN = "123456:BENCHMARK"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+NAMES = ["John", "Alice", "Mohammed", "Priya", "Li Wei", "Olga", "Zoë", "Carlos_99", "Anna Maria"]
+
+def percentile(values: list, pct: float) -> float:
+    """Return the pct-th percentile of values (nearest-rank)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+# Microbenchmarks
+
+def reset_caches() -> None:
+    for cache in (bot_module.KEYBOARD_CACHE, bot_module.RESULT_CACHE, bot_module.INLINE_CACHE):
+        cache.clear()
+
+def run_microbenchmarks(number: int) -> None:
+    """Time the rendering functions and print microseconds per call."""
+    name = "Johnathan Smith"
+    session = asyncio.run(bot_module.SESSIONS.open(name))
+
+    def cold_keyboard():
+        bot_module.RESULT_CACHE.clear()
+        bot_module.create_style_buttons(session, 0)
+
+    def cold_inline():
+        bot_module.RESULT_CACHE.clear()
+        bot_module.build_inline_results(name)
+
+    reset_caches()
+    bot_module.get_style_keyboard(session, 0)
+    cases = [
+        ("generate_stylish_name", lambda: bot_module.generate_stylish_name(name)),
+        ("StyleEngine.render_batch(25)", lambda: bot_module.get_catalog().engine.render_batch(name, 25)),
+        ("render_style (cached)", lambda: bot_module.render_style(name, 3, session.seed)),
+        ("create_style_buttons (cold)", cold_keyboard),
+        ("get_style_keyboard (cached)", lambda: bot_module.get_style_keyboard(session, 0)),
+        ("build_inline_results (cold)", cold_inline),
+    ]
+    print(f"{'benchmark':<32} {'us/call':>12}")
+    for label, func in cases:
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print(f"{label:<32} {seconds / number * 1e6:>12.1f}")
+
+# Fake Bot API
+
+class FakeBotAPI:
+    """Minimal in-process stand-in for the Telegram Bot API."""
+
+    def __init__(self):
+        self.updates = []
+        self.delivered_at = {}   # update_id -> time the bot received it
+        self.calls = {}          # method -> count
+        self.keyboards = {}      # chat_id -> last inline keyboard sent or edited
+        self.documents = []      # contents of documents sent by the bot
+        self._new_updates = asyncio.Event()
+        self._message_id = 1000
+        self.runner = None
+        self.base_url = None
+
+    def add_updates(self, updates: list) -> None:
+        self.updates.extend(updates)
+        self._new_updates.set()
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}/bot"
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = {}
+        for key, value in (await request.post()).items():
+            try:
+                params[key] = json.loads(value)
+            except (TypeError, ValueError):
+                params[key] = value
+        handler = getattr(self, f"api_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    async def api_getMe(self, params: dict):
+        return BOT_USER
+
+    async def api_getUpdates(self, params: dict):
+        offset = int(params.get("offset", 0) or 0)
+        timeout = float(params.get("timeout", 0) or 0)
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        batch = self.updates[:int(params.get("limit", 100) or 100)]
+        now = time.perf_counter()
+        for update in batch:
+            self.delivered_at.setdefault(update["update_id"], now)
+        return batch
+
+    def _message(self, params: dict) -> dict:
+        chat_id = int(params["chat_id"])
+        if "reply_markup" in params:
+            self.keyboards[chat_id] = params["reply_markup"]
+        self._message_id += 1
+        return {
+            "message_id": int(params.get("message_id", self._message_id)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+
+    async def api_sendMessage(self, params: dict):
+        return self._message(params)
+
+    async def api_editMessageText(self, params: dict):
+        return self._message(params)
+
+    async def api_sendDocument(self, params: dict):
+        self.documents.append(params["document"].file.read())
+        return self._message(params)
+
+# Synthetic update streams
+
+class UpdateFactory:
+    """Build Bot API update payloads for a set of synthetic chats."""
+
+    def __init__(self):
+        self.update_id = 1
+        self.message_id = 1
+
+    def _next_ids(self):
+        self.update_id += 1
+        self.message_id += 1
+        return self.update_id, self.message_id
+
+    @staticmethod
+    def _user(chat_id: int) -> dict:
+        return {"id": abs(chat_id), "is_bot": False, "first_name": f"User{abs(chat_id)}"}
+
+    def command(self, chat_id: int, text: str) -> dict:
+        update_id, message_id = self._next_ids()
+        command = text.split()[0]
+        return {"update_id": update_id, "message": {
+            "message_id": message_id, "date": int(time.time()), "text": text,
+            "chat": {"id": chat_id, "type": "private"}, "from": self._user(chat_id),
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        }}
+
+    def callback(self, chat_id: int, data: str) -> dict:
+        update_id, message_id = self._next_ids()
+        return {"update_id": update_id, "callback_query": {
+            "id": str(update_id), "chat_instance": str(chat_id), "data": data,
+            "from": self._user(chat_id),
+            "message": {"message_id": message_id, "date": int(time.time()), "text": "menu",
+                        "chat": {"id": chat_id, "type": "private"}},
+        }}
+
+    def edited_group_message(self, chat_id: int) -> dict:
+        update_id, message_id = self._next_ids()
+        return {"update_id": update_id, "edited_message": {
+            "message_id": message_id, "date": int(time.time()), "edit_date": int(time.time()),
+            "text": "edited", "chat": {"id": -chat_id, "type": "supergroup"},
+            "from": self._user(chat_id),
+        }}
+
+    def inline_query(self, chat_id: int, query: str, offset: str = "") -> dict:
+        update_id, _ = self._next_ids()
+        return {"update_id": update_id, "inline_query": {
+            "id": str(update_id), "from": self._user(chat_id), "query": query, "offset": offset,
+        }}
+
+def keyboard_callbacks(keyboard: dict) -> list:
+    return [
+        button["callback_data"]
+        for row in keyboard.get("inline_keyboard", [])
+        for button in row
+        if button.get("callback_data", "empty") != "empty"
+    ]
+
+# Replay
+
+# update_id -> perf_counter() before and after the bot's handlers ran
+STARTED = {}
+FINISHED = {}
+
+async def replay(fake: FakeBotAPI, updates: list, timeout: float) -> None:
+    """Feed updates to the fake API and wait until the bot has processed them all."""
+    pending = {u["update_id"] for u in updates}
+    fake.add_updates(updates)
+    deadline = time.perf_counter() + timeout
+    while pending and time.perf_counter() < deadline:
+        pending -= set(FINISHED)
+        await asyncio.sleep(0.01)
+    if pending:
+        logger.warning(f"{len(pending)} updates were not processed within {timeout}s")
+
+async def mark_started(update: Update, context) -> None:
+    STARTED[update.update_id] = time.perf_counter()
+
+async def mark_finished(update: Update, context) -> None:
+    FINISHED[update.update_id] = time.perf_counter()
+
+async def run_replay(chats: int, rounds: int, recorded: str, timeout: float) -> None:
+    fake = FakeBotAPI()
+    await fake.start()
+    application = bot_module.build_application(FAKE_TOKEN, base_url=fake.base_url)
+    # Timestamp each update before and after the bot's own handler groups
+    application.add_handler(TypeHandler(Update, mark_started), group=-100)
+    application.add_handler(TypeHandler(Update, mark_finished), group=100)
+    reset_caches()
+
+    async with application:
+        await application.start()
+        await bot_module.start_background_services(application)
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+        started = time.perf_counter()
+
+        factory = UpdateFactory()
+        if recorded:
+            with open(recorded) as f:
+                updates = [json.loads(line) for line in f if line.strip()]
+            await replay(fake, updates, timeout)
+            total = len(updates)
+        else:
+            rng = random.Random(42)
+            chat_ids = list(range(1, chats + 1))
+            # Phase 1: every chat asks for a keyboard
+            updates = [factory.command(c, "/start") for c in chat_ids]
+            updates += [factory.command(c, f"/style {rng.choice(NAMES)}") for c in chat_ids]
+            await replay(fake, updates, timeout)
+            total = len(updates)
+            # Phase 2: page and pick buttons from the keyboards the bot sent
+            for _ in range(rounds):
+                updates = []
+                for chat_id in chat_ids:
+                    callbacks = keyboard_callbacks(fake.keyboards.get(chat_id, {}))
+                    if callbacks:
+                        updates.append(factory.callback(chat_id, rng.choice(callbacks)))
+                    if rng.random() < 0.2:
+                        updates.append(factory.inline_query(chat_id, rng.choice(NAMES)))
+                    if rng.random() < 0.1:
+                        updates.append(factory.edited_group_message(chat_id))
+                await replay(fake, updates, timeout)
+                total += len(updates)
+
+        elapsed = time.perf_counter() - started
+        await application.updater.stop()
+        # Handlers may still be waiting on the dispatcher, so stop them first
+        await application.stop()
+        await bot_module.stop_background_services()
+    await fake.stop()
+
+    handler_ms = [(FINISHED[u] - STARTED[u]) * 1000 for u in FINISHED if u in STARTED]
+    e2e_ms = [(FINISHED[u] - fake.delivered_at[u]) * 1000 for u in FINISHED if u in fake.delivered_at]
+    print(f"updates processed: {len(FINISHED)}/{total} in {elapsed:.2f}s "
+          f"({len(FINISHED) / elapsed:.1f} updates/s)")
+    print(f"handler latency ms: p50={percentile(handler_ms, 50):.2f} p99={percentile(handler_ms, 99):.2f}")
+    print(f"delivery-to-done ms: p50={percentile(e2e_ms, 50):.2f} p99={percentile(e2e_ms, 99):.2f}")
+    print("api calls: " + ", ".join(f"{m}={n}" for m, n in sorted(fake.calls.items())))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("suite", nargs="?", choices=["micro", "replay", "all"], default="all")
+    parser.add_argument("--number", type=int, default=200, help="calls per microbenchmark repeat")
+    parser.add_argument("--chats", type=int, default=50, help="synthetic chats in the replay")
+    parser.add_argument("--rounds", type=int, default=20, help="callback rounds per chat in the replay")
+    parser.add_argument("--updates", help="replay recorded updates from a JSON lines file instead")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for each replay phase")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.suite in ("micro", "all"):
+        run_microbenchmarks(args.number)
+    if args.suite in ("replay", "all"):
+        asyncio.run(run_replay(args.chats, args.rounds, args.updates, args.timeout))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Staged startup for stylish_name_bot.
+
+Binds the web server before anything heavy is imported, so health checks are
+answered within a fraction of a second of a cold start. The bot module
+(python-telegram-bot, the style catalog and the rest) is then imported on a
+worker thread while the event loop keeps serving:
+
+- /healthz (liveness) answers 200 as soon as the port is bound
+- /readyz (readiness) answers 503 with the startup phases so far, and 200
+  once updates are being received
+- every other route answers 503 until the bot's own handlers take over
+
+Run it instead of stylish_name_bot.py: python launcher.py
+"""
+import asyncio
+import importlib
+import logging
+import os
+import signal
+import time
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+class StagedWebApp:
+    """aiohttp app whose routes are served by the bot once it has loaded."""
+
+    def __init__(self):
+        self.handlers = {}  # (method, path) -> handler, filled in by the bot
+        self.phases = []    # (phase, seconds) recorded before the bot module exists
+        self.app = web.Application()
+        self.app.router.add_route('*', '/{tail:.*}', self.dispatch)
+
+    async def dispatch(self, request: web.Request) -> web.StreamResponse:
+        handler = self.handlers.get((request.method, request.path))
+        if handler is not None:
+            return await handler(request)
+        if self.handlers:
+            raise web.HTTPNotFound()
+        if request.path == '/healthz':
+            return web.Response(text="ok")
+        if request.path == '/readyz':
+            return web.json_response({"state": "starting", "phases": dict(self.phases)}, status=503)
+        return web.Response(status=503, text="Bot is starting")
+
+    def record(self, name: str, started: float) -> None:
+        self.phases.append((name, round(time.perf_counter() - started, 4)))
+
+async def launch(port: int) -> None:
+    staged = StagedWebApp()
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    started = time.perf_counter()
+    runner = web.AppRunner(staged.app)
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    staged.record("web_server", started)
+    logger.info(f"Health endpoints up on port {port}")
+
+    try:
+        started = time.perf_counter()
+        # The import is mostly CPU-bound, but the GIL is released often
+        # enough for health checks to be answered meanwhile
+        bot = await asyncio.to_thread(importlib.import_module, "stylish_name_bot")
+        staged.record("import", started)
+        bot.STARTUP_PHASES[:0] = staged.phases
+        if stop_event.is_set():
+            return
+
+        with bot.startup_phase("lock"):
+            locked = await asyncio.to_thread(bot.create_lock)
+        if not locked:
+            logger.error("Another bot instance is already running. Exiting.")
+            return
+        try:
+            # The lock wait can take LOCK_WAIT_TIMEOUT seconds; a stop signal
+            # received meanwhile must not start polling or set the webhook
+            if stop_event.is_set():
+                return
+            created = bot.create_bot()
+            if created is None:
+                return
+            application, pool = created
+            bot.install_signal_handlers(stop_event, pool)
+            staged.handlers = bot.web_handlers(application, pool)
+            await bot.serve(application, stop_event, pool)
+        finally:
+            bot.remove_lock()
+    finally:
+        await runner.cleanup()
+
+def main():
+    """Entry point: bring up health checks first, then load and run the bot."""
+    load_dotenv()
+    port = int(os.getenv('PORT', 8080))
+    try:
+        asyncio.run(launch(port))
+    except Exception as e:
+        logger.error(f"Unhandled exception: {e}", exc_info=True)
+    finally:
+        logger.info("Application stopped")
+
+if __name__ == '__main__':
+    main()
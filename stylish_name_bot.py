@@ -1,14 +1,34 @@
 import os
 import random
-import string
 import asyncio
-import sys
+import bisect
+import contextlib
+import contextvars
+import difflib
+import functools
 import logging
 import signal
 import time
+import zlib
 import atexit
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackContext, CallbackQueryHandler, MessageHandler, filters
+import fcntl
+import hashlib
+import json
+import heapq
+import multiprocessing
+import queue
+import re
+import secrets
+import sqlite3
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from itertools import repeat
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+from telegram.error import RetryAfter
+from telegram.ext import Application, BaseUpdateProcessor, CommandHandler, CallbackContext, CallbackQueryHandler, InlineQueryHandler, MessageHandler, TypeHandler, filters
+from telegram.request import HTTPXRequest
 from dotenv import load_dotenv
 from aiohttp import web
 from telegram.ext import Updater
@@ -24,50 +44,413 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 # Global variables
-LOCKFILE = "/tmp/stylish_name_bot.lock"
+LOCKFILE = os.getenv('LOCKFILE', "/tmp/stylish_name_bot.lock")
+LOCK_WAIT_TIMEOUT = float(os.getenv('LOCK_WAIT_TIMEOUT', 30))
 BOT_INSTANCE_ID = f"{os.getpid()}-{int(time.time())}"
+_lock_fd = None
+
+# Lifecycle: "starting" -> "running" -> "draining" (after SIGTERM/SIGINT)
+LIFECYCLE_STATE = "starting"
+# Seconds to finish in-flight work after a stop signal before exiting anyway
+SHUTDOWN_DEADLINE = float(os.getenv('SHUTDOWN_DEADLINE', 25))
+# (phase, seconds) for each startup step in order, reported on /readyz
+STARTUP_PHASES = []
+
+@contextlib.contextmanager
+def startup_phase(name: str):
+    """Time a startup step and record it in STARTUP_PHASES."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_PHASES.append((name, round(time.perf_counter() - started, 4)))
+
+def startup_report() -> dict:
+    return {
+        "state": LIFECYCLE_STATE,
+        "instance": BOT_INSTANCE_ID,
+        "phases": dict(STARTUP_PHASES),
+        "total": round(sum(seconds for _, seconds in STARTUP_PHASES), 4),
+    }
+
+# Update delivery: "webhook" receives updates on the web server, "polling" calls getUpdates.
+# Render sets RENDER_EXTERNAL_URL for web services, so webhooks work there without extra config.
+WEBHOOK_URL = os.getenv('WEBHOOK_URL') or os.getenv('RENDER_EXTERNAL_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or hashlib.sha256(
+    os.getenv('TELEGRAM_BOT_TOKEN', '').encode()
+).hexdigest()[:32]
+BOT_MODE = os.getenv('BOT_MODE', 'webhook' if WEBHOOK_URL else 'polling').lower()
+
+# Worker mode: with WORKERS > 1 this process only receives updates and fans
+# them out, sharded by chat, to that many worker processes
+WORKERS = int(os.getenv('WORKERS', 1))
 
 def create_lock():
-    """Create a lock file to prevent multiple instances."""
+    """Take an exclusive advisory lock on LOCKFILE to prevent multiple instances.
+
+    The kernel releases fcntl locks when the process dies, so there are no
+    stale locks to detect. During an overlapping deploy the new instance
+    waits up to LOCK_WAIT_TIMEOUT seconds for the old one to drain and exit.
+    """
+    global _lock_fd
     try:
-        if os.path.exists(LOCKFILE):
-            # Read existing lock file
-            with open(LOCKFILE, 'r') as f:
-                existing_pid = f.read().strip()
-            logger.info(f"Found existing lock file with PID: {existing_pid}")
-            
-            # Check if the process is still running
-            try:
-                pid = int(existing_pid.split('-')[0])
-                os.kill(pid, 0)  # This will raise OSError if process is not running
-                logger.error(f"Another bot instance is already running with PID {pid}")
-                return False
-            except (OSError, ValueError):
-                logger.info("Existing lock is stale. Overwriting it.")
-                pass  # Process not running, we can proceed
-        
-        # Create or update lock file
-        with open(LOCKFILE, 'w') as f:
-            f.write(BOT_INSTANCE_ID)
-        logger.info(f"Lock file created with ID: {BOT_INSTANCE_ID}")
-        
-        # Register cleanup function to remove lock file on exit
-        atexit.register(remove_lock)
-        return True
-    except Exception as e:
-        logger.error(f"Error creating lock file: {e}")
+        fd = os.open(LOCKFILE, os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError as e:
+        logger.error(f"Error opening lock file: {e}")
         return False
+    
+    deadline = time.monotonic() + LOCK_WAIT_TIMEOUT
+    waiting_logged = False
+    while True:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                holder = os.pread(fd, 64, 0).decode(errors='replace').strip()
+                logger.error(f"Another bot instance is already running with ID {holder}")
+                os.close(fd)
+                return False
+            if not waiting_logged:
+                logger.info("Lock is held by another instance. Waiting for it to shut down...")
+                waiting_logged = True
+            time.sleep(0.5)
+    
+    # Record who holds the lock, for diagnostics only
+    os.ftruncate(fd, 0)
+    os.pwrite(fd, BOT_INSTANCE_ID.encode(), 0)
+    _lock_fd = fd
+    logger.info(f"Lock acquired with ID: {BOT_INSTANCE_ID}")
+    
+    # Register cleanup function to release the lock on exit
+    atexit.register(remove_lock)
+    return True
 
 def remove_lock():
-    """Remove the lock file on exit."""
+    """Release the instance lock."""
+    global _lock_fd
+    if _lock_fd is None:
+        return
     try:
-        if os.path.exists(LOCKFILE):
-            with open(LOCKFILE, 'r') as f:
-                if f.read().strip() == BOT_INSTANCE_ID:
-                    os.remove(LOCKFILE)
-                    logger.info("Lock file removed")
-    except Exception as e:
-        logger.error(f"Error removing lock file: {e}")
+        # The file itself stays: unlinking it would let a new instance lock a
+        # fresh inode while a waiting one still holds the old one
+        fcntl.flock(_lock_fd, fcntl.LOCK_UN)
+        os.close(_lock_fd)
+        logger.info("Lock released")
+    except OSError as e:
+        logger.error(f"Error releasing lock: {e}")
+    _lock_fd = None
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+# Outbound priority lanes, lowest value is sent first
+PRIORITY_ANSWER = 0   # answerCallbackQuery: the user is watching a spinner
+PRIORITY_SEND = 1     # replies and keyboard edits
+PRIORITY_WARNING = 2  # edit warnings and deletions
+
+class OutboundDispatcher:
+    """Priority queue for Bot API calls, paced by global and per-chat token buckets.
+
+    Calls are issued in priority order as soon as both the global bucket and
+    the target chat's bucket have a token. RetryAfter pauses the affected
+    bucket and requeues the call: the chat's bucket for that lane, or the global
+    bucket for calls that are not tied to a chat. A call submitted with the same
+    `collapse_key` as a call still waiting in the queue replaces it, so only
+    the latest edit of a message is sent.
+    """
+
+    def __init__(self, global_rate: float = 30, private_rate: float = 1, group_rate: float = 20 / 60,
+                 group_burst: float = 20):
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.global_rate = global_rate
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}      # chat_id or (lane, chat_id) -> TokenBucket
+        self._queue = []      # [priority, seq, chat_id, call, future, collapse_key, lane]
+        self._collapsible = {}
+        self._seq = 0
+        self._in_flight = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.sent = 0
+        self.retried = 0
+        self.collapsed = 0
+
+    def start(self) -> None:
+        """Start the dispatch task on the running event loop."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the dispatch task; queued calls fail with RuntimeError."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        queued, self._queue = self._queue, []
+        self._collapsible.clear()
+        for item in queued:
+            if not item[4].done():
+                item[4].set_exception(RuntimeError("Outbound dispatcher stopped before sending"))
+
+    async def call(self, priority: int, chat_id, func, *args, collapse_key=None, lane="message", **kwargs):
+        """Queue `func(*args, **kwargs)` and return its result once sent.
+
+        `chat_id` selects the per-chat bucket; pass None for calls that are
+        only subject to the global limit, such as callback answers. Calls in
+        the "delete" lane use a separate per-chat bucket that is only limited
+        by the global rate, so deletions do not use up a chat's message quota
+        but a flood wait on them still only pauses that chat's deletions.
+        """
+        call = functools.partial(func, *args, **kwargs)
+        pending = self._collapsible.get(collapse_key) if collapse_key is not None else None
+        if pending is not None:
+            # Keep the earlier queue position but send the newer content
+            pending[3] = call
+            self.collapsed += 1
+            return await asyncio.shield(pending[4])
+        future = asyncio.get_running_loop().create_future()
+        item = [priority, self._seq, chat_id, call, future, collapse_key, lane]
+        self._seq += 1
+        self._queue.append(item)
+        if collapse_key is not None:
+            self._collapsible[collapse_key] = item
+        self._wakeup.set()
+        slot = CURRENT_SLOT.get()
+        if slot is None:
+            return await asyncio.shield(future)
+        # Waiting for a token is not work: let other chats' updates use the slot meanwhile
+        slot.release()
+        try:
+            return await asyncio.shield(future)
+        finally:
+            await slot.acquire()
+
+    async def join(self) -> None:
+        """Wait until every queued and in-flight call has been sent."""
+        while self._queue or self._in_flight:
+            await asyncio.sleep(0.05)
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queue),
+            "in_flight": len(self._in_flight),
+            "sent": self.sent,
+            "retried": self.retried,
+            "collapsed": self.collapsed,
+        }
+
+    def _chat_bucket(self, chat_id, lane: str = "message") -> TokenBucket:
+        key = chat_id if lane == "message" else (lane, chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            if len(self._chats) > 10000:
+                # Forget idle chats whose buckets have refilled
+                now = time.monotonic()
+                self._chats = {
+                    key: b for key, b in self._chats.items()
+                    if b.wait_time(now) > 0 or b.tokens < b.capacity
+                }
+            # Negative ids are groups and channels: 20 messages per minute, which
+            # may come in a burst
+            if lane != "message":
+                bucket = TokenBucket(self.global_rate, self.global_rate)
+            elif chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.private_rate, max(1, self.private_rate * 3))
+            self._chats[key] = bucket
+        return bucket
+
+    async def _run(self) -> None:
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            delay = self._global.wait_time(now)
+            item = None
+            if delay == 0:
+                delay = None
+                for candidate in sorted(self._queue):
+                    chat_id = candidate[2]
+                    wait = self._chat_bucket(chat_id, candidate[6]).wait_time(now) if chat_id is not None else 0.0
+                    if wait == 0:
+                        item = candidate
+                        break
+                    delay = wait if delay is None else min(delay, wait)
+
+            if item is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._queue.remove(item)
+            if item[5] is not None:
+                self._collapsible.pop(item[5], None)
+            self._global.consume()
+            if item[2] is not None:
+                self._chat_bucket(item[2], item[6]).consume()
+            task = asyncio.create_task(self._send(item))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, item: list) -> None:
+        future = item[4]
+        try:
+            result = await item[3]()
+        except RetryAfter as e:
+            logger.warning(f"Flood limit hit for chat {item[2]} ({item[6]}), retrying in {e.retry_after}s")
+            # Only calls without a chat are limited bot-wide
+            bucket = self._chat_bucket(item[2], item[6]) if item[2] is not None else self._global
+            bucket.paused_until = time.monotonic() + e.retry_after
+            self.retried += 1
+            self._queue.append(item)
+            self._wakeup.set()
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            self.sent += 1
+            if not future.done():
+                future.set_result(result)
+
+DISPATCHER = OutboundDispatcher(
+    global_rate=float(os.getenv('GLOBAL_SEND_RATE', 30)),
+    private_rate=float(os.getenv('CHAT_SEND_RATE', 1)),
+    group_rate=float(os.getenv('GROUP_SEND_RATE', 20 / 60)),
+    group_burst=float(os.getenv('GROUP_SEND_BURST', 20)),
+)
+
+class DeferredDeleter:
+    """Timer heap of pending message deletions, sent to Telegram in per-chat batches.
+
+    Deletions that fall due within `coalesce_window` seconds of each other are
+    grouped by chat and removed with one deleteMessages call per chat. A
+    deletion may be sent up to `coalesce_window` seconds late, never early.
+    """
+
+    def __init__(self, coalesce_window: float = 1.0):
+        self.coalesce_window = coalesce_window
+        self.bot = None
+        self._heap = []        # (due, chat_id, message_id)
+        self._pending = set()  # (chat_id, message_id) reserved or scheduled
+        self._batches = set()  # delete tasks still being sent
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self, bot) -> None:
+        """Start the background timer task on the running event loop."""
+        self.bot = bot
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the timer task."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def flush(self) -> None:
+        """Delete every pending message now and wait for all deletions to be sent."""
+        self._send_due(float("inf"))
+        await asyncio.gather(*self._batches)
+
+    def reserve(self, chat_id: int, message_id: int) -> bool:
+        """Mark a message as about to be deleted, before its timer is known.
+
+        Returns False if the message is already reserved or scheduled, so
+        callers can skip repeated warnings for the same message.
+        """
+        key = (chat_id, message_id)
+        if key in self._pending:
+            return False
+        self._pending.add(key)
+        return True
+
+    def schedule(self, chat_id: int, message_id: int, delay: float) -> None:
+        """Delete a message after `delay` seconds."""
+        self._pending.add((chat_id, message_id))
+        heapq.heappush(self._heap, (time.monotonic() + delay, chat_id, message_id))
+        self._wakeup.set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def _run(self) -> None:
+        while True:
+            # Wait out the window after the earliest deletion falls due, so the
+            # ones due shortly after it join the batch without going early
+            timeout = self._heap[0][0] + self.coalesce_window - time.monotonic() if self._heap else None
+            if timeout is None or timeout > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._send_due(time.monotonic())
+
+    def _send_due(self, horizon: float) -> None:
+        """Start one delete task per chat for everything due before `horizon`.
+
+        The tasks run on their own, so a throttled chat does not hold up the
+        timer for other chats.
+        """
+        batches = {}
+        while self._heap and self._heap[0][0] <= horizon:
+            _, chat_id, message_id = heapq.heappop(self._heap)
+            self._pending.discard((chat_id, message_id))
+            batches.setdefault(chat_id, []).append(message_id)
+        for chat_id, message_ids in batches.items():
+            task = asyncio.create_task(self._delete(chat_id, message_ids))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _delete(self, chat_id: int, message_ids: list) -> None:
+        # deleteMessages takes at most 100 ids
+        for i in range(0, len(message_ids), 100):
+            chunk = message_ids[i:i + 100]
+            try:
+                # Deletions are not messages: they have their own per-chat lane
+                await DISPATCHER.call(
+                    PRIORITY_WARNING, chat_id, self.bot.delete_messages, chat_id, chunk, lane="delete"
+                )
+                logger.info(f"Deleted edited messages {chunk} in chat {chat_id}")
+            except Exception as e:
+                logger.error(f"Could not delete edited messages {chunk} in chat {chat_id}: {e}")
+
+# Seconds an edited group message stays visible next to its warning before deletion
+EDIT_DELETE_DELAY = float(os.getenv('EDIT_DELETE_DELAY', 5))
+DEFERRED_DELETIONS = DeferredDeleter()
 
 async def handle_edited_message(update: Update, context: CallbackContext) -> None:
     """Handle edited messages in group chats."""
@@ -75,8 +458,12 @@ async def handle_edited_message(update: Update, context: CallbackContext) -> Non
         original_text = update.edited_message.text
         edited_text = update.edited_message.edit_date
         
-        # Store edited message ID
-        edited_message_id = update.edited_message.message_id
+        # Reserve the deletion first; a message edited again before it is gone
+        # is already reserved and has already been warned about
+        chat_id = update.edited_message.chat.id
+        message_id = update.edited_message.message_id
+        if not DEFERRED_DELETIONS.reserve(chat_id, message_id):
+            return
         
         warning_message = (
             f"⚠️ Warning: Message edited by {update.edited_message.from_user.first_name}\n"
@@ -84,155 +471,715 @@ async def handle_edited_message(update: Update, context: CallbackContext) -> Non
             f"Edited at: {edited_text}"
         )
         
-        # Send warning
-        await update.edited_message.reply_text(warning_message)
-        
-        # Try to delete the edited message
+        # Send warning. The warning can wait behind the group's rate limit, so
+        # the deletion timer only starts once it is up
         try:
-            # Wait 5 seconds before deletion to allow users to see the warning
-            await asyncio.sleep(5)
-            await update.edited_message.delete()
-            logger.info(f"Deleted edited message {edited_message_id} in chat {update.edited_message.chat.id}")
-        except Exception as e:
-            logger.error(f"Could not delete edited message: {e}")
-
-# Stylish characters for name generation
-STYLISH_CHARS = {
-    'a': ['α', 'ą', 'å', 'à', 'á', 'â', 'ã', 'ä', 'æ', '𝗔', '𝐀', '𝘈', '𝘼', '𝔄', '𝕬', '𝔸', '🄰', 'Ⓐ', 'Ꭺ', 'а', 'Ａ', 'ん', 'Ⱥ', '𝙰', 'Ɦ', '𝚨', '𝜜', '𝖆', 'ꮧ', 'ค', 'ꞏ', 'ꋫ', 'ᗩ', 'ᵃ', 'ₐ', 'ᴀ', '🅐', 'Λ', 'ꋬ', 'ꍏ', 'ǟ', 'a̾', 'ꁲ'],
-    'b': ['β', 'b̶', 'b̷', 'b̸', '𝗕', '𝐁', '𝘉', '𝘽', '𝔅', '𝕭', '𝔹', '🄱', 'Ⓑ', 'Ᏼ', 'в', 'Ｂ', '乃', 'Ƀ', '𝙱', 'Ꞗ', '𝚩', '𝜝', '𝖇', 'ꮄ', '๒', 'Ꮽ', 'ꃃ', 'ᗷ', 'ᵇ', 'ᵦ', 'ʙ', '🅑', 'ꋰ', 'ꃳ', 'ß', 'b̾', 'ꋍ'],
-    'c': ['c̶', 'c̷', 'c̸', 'ç', '𝗖', '𝐂', '𝘊', '𝘾', 'ℭ', '𝕮', 'ℂ', '🄲', 'Ⓒ', 'Ꮯ', 'c', 'Ｃ', '匚', 'Ȼ', '𝙲', 'Ꮯ', '𝚪', '𝜞', '𝖈', 'ꮸ', 'ς', 'Ꮸ', 'ꉔ', 'ᑕ', 'ᶜ', 'ƈ', 'ᴄ', '🅒', '↻', 'ꏳ', '꒝', 'ƈ', 'c̾', 'ꇓ'],
-    'd': ['d̶', 'd̷', 'd̸', 'đ', '𝗗', '𝐃', '𝘋', '𝘿', '𝔇', '𝕯', '𝔻', '🄳', 'Ⓓ', 'Ꭰ', 'd', 'Ｄ', '刀', 'Ꭰ', '𝙳', 'Ꭰ', '𝚫', '𝜟', '𝖉', 'ꮷ', '๔', 'Ꮄ', 'ꊱ', 'ᗪ', 'ᵈ', 'ɖ', 'ᴅ', '🅓', 'ꀸ', 'ꂠ', 'Ꭰ', 'd̾', 'ꅐ'],
-    'e': ['ε', 'ę', 'è', 'é', 'ê', 'ë', '𝗘', '𝐄', '𝘌', '𝙀', '𝔈', '𝕰', '𝔼', '🄴', 'Ⓔ', 'Ꭼ', 'є', 'Ｅ', 'モ', 'Ɇ', '𝙴', 'ꞓ', '𝚬', '𝜠', '𝖊', 'ꮛ', 'є', 'Ꮛ', 'ꏂ', 'ᗴ', 'ᵉ', 'ₑ', 'ᴇ', '🅔', 'ꉢ', 'ꏼ', 'E', 'e̾', 'ꍟ'],
-    'f': ['f̶', 'f̷', 'f̸', '𝗙', '𝐅', '𝘍', '𝙁', '𝔉', '𝕱', '𝔽', '🄵', 'Ⓕ', 'Ꮄ', 'f', 'Ｆ', '下', 'Ϝ', '𝙵', 'Ꞙ', '𝚭', '𝜡', '𝖋', 'ꞙ', 'Ŧ', 'Ꞧ', 'ꎇ', 'ᖴ', 'ᶠ', 'ꎇ', 'ғ', '🅕', 'ꉱ', 'ꄞ', 'F', 'f̾', 'ꄲ'],
-    'g': ['g̶', 'g̷', 'g̸', '𝗚', '𝐆', '𝘎', '𝙂', '𝔊', '𝕲', '𝔾', '🄶', 'Ⓖ', 'Ꮆ', 'g', 'Ｇ', 'ら', 'Ǥ', '𝙶', 'Ꞡ', '𝚮', '𝜢', '𝖌', 'ꮆ', 'ﻮ', 'Ꮑ', 'ꁅ', 'ᘜ', 'ᵍ', 'ɢ', '🅖', 'ꀯ', 'ꍌ', 'g', 'g̾', 'ꁅ'],
-    'h': ['h̶', 'h̷', 'h̸', '𝗛', '𝐇', '𝘏', '𝙃', '𝔥', '𝕳', 'ℍ', '🄷', 'Ⓗ', 'Ꮋ', 'н', 'Ｈ', 'ん', 'Ȟ', '𝙷', 'Ꞝ', '𝚯', '𝜣', '𝖍', 'ꮒ', 'ђ', 'Ꮵ', 'ꀍ', 'ᕼ', 'ʰ', 'ₕ', 'ʜ', '🅗', 'ꀍ', 'ꢻ', 'н', 'h̾', 'ꍩ'],
-    'i': ['ι', 'ì', 'í', 'î', 'ï', '𝗜', '𝐈', '𝘐', '𝙄', '𝔦', '𝕴', '𝕀', '🄸', 'Ⓘ', 'Ꭵ', 'і', 'Ｉ', '工', 'ɨ', '𝙸', 'ɨ', '𝚰', '𝜤', '𝖎', 'ꭵ', 'เ', 'Ꭵ', 'ꀤ', 'ᓰ', 'ⁱ', 'ᵢ', 'ɪ', '🅘', 'ꂦ', 'ⅈ', 'i', 'i̾', 'ꀤ'],
-    'j': ['j̶', 'j̷', 'j̸', '𝗝', '𝐉', '𝘑', '𝙅', '𝔍', '𝕵', '𝕁', 'Ĵ', 'Ⓙ', 'Ꭻ', 'ј', 'Ｊ', 'ﾌ', 'Ɉ', '𝙹', 'Ꞥ', '𝚱', '𝜥', '𝖏', 'ꭻ', 'ן', 'Ꮴ', 'ꀭ', 'ᒍ', 'ʲ', 'ⱼ', 'ᴊ', '🅙', 'ꋊ', 'ꀭ', 'j', 'j̾', 'ꈤ'],
-    'k': ['k̶', 'k̷', 'k̸', '𝗞', '𝐊', '𝘒', '𝙆', '𝔎', '𝕶', '𝕂', '🄺', 'Ⓚ', 'Ꮶ', 'к', 'Ｋ', '𝕜', 'Қ', '𝙺', 'Ꮶ', '𝚲', '𝜦', '𝖐', 'ꮶ', 'к', 'Ꮵ', 'ꀘ', 'ᛕ', 'ᵏ', 'ₖ', 'ᴋ', '🅚', 'ꀘ', 'ꋊ', 'к', 'k̾', 'ꀘ'],
-    'l': ['l̶', 'l̷', 'l̸', 'ł', '𝗟', '𝐋', '𝘓', '𝙇', '𝔏', '𝕷', '𝕃', '🄻', 'Ⓛ', 'Ꮮ', 'l', 'Ｌ', 'ㄥ', 'Ɬ', '𝙻', 'Ꮮ', '𝚳', '𝜧', '𝖑', 'ꮭ', 'l', 'Ꮗ', 'ꀤ', 'ᒪ', 'ˡ', 'ₗ', 'ʟ', '🅛', 'ꂖ', 'ꍂ', 'L', 'l̾', 'ꋊ'],
-    'm': ['m̶', 'm̷', 'm̸', '𝗠', '𝐌', '𝘔', '𝙈', '𝔐', '𝕸', '𝕄', '🄼', 'Ⓜ️', 'Ꮇ', 'м', 'Ｍ', '爪', 'ϻ', '𝙼', 'Ɦ', '𝚴', '𝜨', '𝖒', 'ꮇ', '๓', 'Ꮇ', 'ꂵ', 'ᗰ', 'ᵐ', 'ₘ', 'ᴍ', '🅜', 'ꎭ', 'ꂵ', 'м', 'm̾', 'ꎭ'],
-    'n': ['n̶', 'n̷', 'n̸', 'ñ', '𝗡', '𝐍', '𝘕', '𝙉', '𝔑', '𝕹', 'ℕ', '🄽', 'Ⓝ', 'Ꮑ', 'и', 'Ｎ', '凵', 'Ƞ', '𝙽', 'Ꞟ', '𝚵', '𝜩', '𝖓', 'ꮑ', 'ภ', 'Ꮑ', 'ꋊ', 'ᑎ', 'ⁿ', 'ₙ', 'ɴ', '🅝', 'ꋊ', 'ꃔ', 'и', 'n̾', 'ꉧ'],
-    'o': ['ο', 'ò', 'ó', 'ô', 'õ', 'ö', 'ø', '𝗢', '𝐎', '𝘖', '𝙊', '𝔒', '𝕺', '𝕆', '🄾', 'Ⓞ', 'Ꮎ', 'o', 'Ｏ', '口', 'Ỗ', '𝙾', 'Ȣ', '𝚶', '𝜪', '𝖔', 'ꮻ', '๏', 'Ꭷ', 'ꄲ', 'ᗝ', 'ᵒ', 'ₒ', 'ᴏ', '🅞', 'ꂦ', 'ꁏ', 'о', 'o̾', 'ꄱ'],
-    'p': ['p̶', 'p̷', 'p̸', '𝗣', '𝐏', '𝘗', '𝙋', '𝔓', '𝕻', 'ℙ', '🄿', 'Ⓟ', 'Ꮲ', 'р', 'Ｐ', 'や', 'ρ', '𝙿', 'Ꞓ', '𝚷', '𝜫', '𝖕', 'ꮲ', 'р', 'Ꮔ', 'ꉣ', 'ᑭ', 'ᵖ', 'ₚ', 'ᴘ', '🅟', 'ꉣ', 'ꋊ', 'p', 'p̾', 'ꉣ'],
-    'q': ['q̶', 'q̷', 'q̸', '𝗤', '𝐐', '𝘘', '𝙌', '𝔔', '𝕼', 'ℚ', '🅀', 'Ⓠ', 'Ꮕ', 'q', 'Ｑ', '𝕜', 'Ϙ', '𝚀', 'Ʞ', '𝚸', '𝜬', '𝖖', 'ꮕ', 'ợ', 'Ꭴ', 'ꋠ', 'ᑫ', 'ᑫ', 'ᵠ', 'ǫ', '🅠', 'ꁷ', 'ꃛ', 'q', 'q̾', 'ꆛ'],
-    'r': ['r̶', 'r̷', 'r̸', '𝗥', '𝐑', '𝘙', '𝙍', '𝔕', '𝕽', 'ℝ', '🅁', 'Ⓡ', 'Ꭱ', 'r', 'Ｒ', '尺', 'Ɍ', '𝚁', 'ꞣ', '𝚹', '𝜭', '𝖗', 'ꮢ', 'г', 'Ꮁ', 'ꋪ', 'ᖇ', 'ʳ', 'ᵣ', 'ʀ', '🅡', 'ꋪ', 'ꋊ', 'r', 'r̾', 'ꋪ'],
-    's': ['s̶', 's̷', 's̸', 'š', '𝗦', '𝐒', '𝘚', '𝙎', '𝔖', '𝕾', '𝕊', '🅂', 'Ⓢ', 'Ꮪ', 'ѕ', 'Ｓ', 'ち', 'Ϟ', '𝚂', 'Ꞧ', '𝚺', '𝜮', '𝖘', 'ꮪ', 'ร', 'Ꮄ', 'ꌗ', 'ᔕ', 'ˢ', 'ₛ', 's', '🅢', 'ꉹ', 'ꌚ', 's', 's̾', 'ꌗ'],
-    't': ['t̶', 't̷', 't̸', '𝗧', '𝐓', '𝘛', '𝙏', '𝔗', '𝕿', '𝕋', '🅃', 'Ⓣ', 'Ꮖ', 'т', 'Ｔ', '匕', 'Ͳ', '𝚃', 'ꞧ', '𝚻', '𝜯', '𝖙', 'ꮖ', 't', 'Ꮏ', '꓄', 'ᕋ', 'ᵗ', 'ₜ', 'ᴛ', '🅣', '꓄', 'ꋖ', 't', 't̾', '꓅'],
-    'u': ['υ', 'ù', 'ú', 'û', 'ü', '𝗨', '𝐔', '𝘜', '𝙐', '𝔘', '𝖀', '𝕌', '🅄', 'Ⓤ', 'Ꮼ', 'υ', 'Ｕ', 'ひ', 'Ⴎ', '𝚄', 'Ꮜ', '𝚼', '𝜰', '𝖚', 'ꮜ', 'ย', 'Ꮀ', 'ꀎ', 'ᑌ', 'ᵘ', 'ᵤ', 'ᴜ', '🅤', 'ꀎ', 'ꏵ', 'u', 'u̾', 'ꀎ'],
-    'v': ['v̶', 'v̷', 'v̸', '𝗩', '𝐕', '𝘝', '𝙑', '𝔙', '𝖁', '𝕍', '🅅', 'Ⓥ', 'Ꮩ', 'v', 'Ｖ', '∨', 'Ỽ', '𝚅', 'ꞥ', '𝚽', '𝜱', '𝖛', 'ꮩ', 'ש', 'Ꭽ', 'ꃴ', 'ᐯ', 'ᵛ', 'ᵥ', 'ᴠ', '🅥', 'ꀰ', 'ꏙ', 'v', 'v̾', 'ꁴ'],
-    'w': ['w̶', 'w̷', 'w̸', '𝗪', '𝐖', '𝘞', '𝙒', '𝔚', '𝖂', '𝕎', '🅆', 'Ⓦ', 'Ꮃ', 'w', 'Ｗ', '山', 'Ѡ', '𝚆', 'Ѡ', '𝚾', '𝜲', '𝖜', 'ꮗ', 'ฝ', 'Ꮗ', 'ꅐ', 'ᗯ', 'ʷ', 'ₙ', 'ᴡ', '🅦', 'ꅐ', 'ꋬ', 'w', 'w̾', 'ꅐ'],
-    'x': ['x̶', 'x̷', 'x̸', '𝗫', '𝐗', '𝘟', '𝙓', '𝔛', '𝖃', '𝕏', '🅇', 'Ⓧ', 'Ꮍ', 'х', 'Ｘ', 'メ', 'ϰ', '𝚇', 'Ꮍ', '𝚿', '𝜳', '𝖝', 'ꮂ', 'א', 'Ꮽ', 'ꊼ', '᙭', 'ˣ', 'ₓ', 'x', '🅧', 'ꊼ', 'ꏗ', 'х', 'x̾', 'ꊼ'],
-    'y': ['y̶', 'y̷', 'y̸', 'ý', '𝗬', '𝐘', '𝘠', '𝙔', '𝔜', '𝖄', '𝕐', '🅈', 'Ⓨ', 'Ꮍ', 'у', 'Ｙ', 'ㄚ', 'Ϥ', '𝚈', 'Ꮓ', '𝛀', '𝜴', '𝖞', 'ꭹ', 'ץ', 'Ꭹ', 'ꐟ', 'ᖻ', 'ʸ', 'ᵧ', 'ʏ', '🅨', 'ꐞ', 'ꏯ', 'y', 'y̾', 'ꐧ'],
-    'z': ['z̶', 'z̷', 'z̸', 'ž', '𝗭', '𝐙', '𝘡', '𝙕', '𝔷', '𝖅', 'ℤ', '🅉', 'Ⓩ', 'Ꮓ', 'z', 'Ｚ', '乙', 'ɀ', '𝚉', 'Ꮓ', '𝜵', '𝖟', 'ꮓ', 'չ', 'Ꮓ', 'ꓜ', 'Ꮓ', 'ᶻ', 'ᵣ', 'ᴢ', '🅩', 'ꁴ', 'ꁉ', 'z', 'z̾', 'ꑄ']
+            await DISPATCHER.call(
+                PRIORITY_WARNING, chat_id,
+                update.edited_message.reply_text, warning_message
+            )
+        finally:
+            DEFERRED_DELETIONS.schedule(chat_id, message_id, EDIT_DELETE_DELAY)
+
+class StyleEngine:
+    """Precompiled glyph tables for rendering stylish names in bulk."""
+
+    def __init__(self, chars: dict):
+        # Freeze the catalog into tuples once so every render indexes flat arrays
+        self.tables = {char: tuple(glyphs) for char, glyphs in chars.items()}
+
+    def render(self, name: str, rng: random.Random = random) -> str:
+        """Render a single stylish variant of the name."""
+        return self.render_batch(name, 1, rng)[0]
+
+    def render_batch(self, name: str, count: int, rng: random.Random = random) -> list:
+        """Render `count` independent stylish variants of the name in one pass.
+
+        Glyphs are drawn one column (character position) at a time, so the
+        number of RNG calls grows with the name length instead of
+        count x length.
+        """
+        if count <= 0:
+            return []
+        columns = []
+        for char in name.lower():
+            glyphs = self.tables.get(char)
+            if glyphs is None:
+                columns.append(repeat(char, count))
+            else:
+                columns.append(rng.choices(glyphs, k=count))
+        if not columns:
+            return [""] * count
+        return ["".join(parts) for parts in zip(*columns)]
+
+class StyleCatalog:
+    """Compiled style catalog: glyph tables plus font templates pre-split at their placeholder."""
+
+    def __init__(self, fonts: tuple, templates: tuple, tables: dict, version: str):
+        self.fonts = fonts
+        self.templates = templates
+        self.engine = StyleEngine(tables)
+        self.version = version
+        # Stable keys survive styles being added, removed or reordered in styles.json
+        self.keys = tuple(style_key(font) for font in fonts)
+        self._index_by_key = {key: idx for idx, key in enumerate(self.keys)}
+        self._search_index = None
+
+    def __len__(self) -> int:
+        return len(self.fonts)
+
+    def search_index(self) -> "StyleSearchIndex":
+        """Return the search index, building it on first use."""
+        if self._search_index is None:
+            self._search_index = StyleSearchIndex(self.fonts)
+        return self._search_index
+
+    def search(self, term: str) -> list:
+        """Return indices of styles matching a search term."""
+        return self.search_index().search(term)
+
+    def apply(self, style_idx: int, stylish_name: str) -> str:
+        """Insert the stylish name into the template of a style."""
+        return stylish_name.join(self.templates[style_idx])
+
+    def resolve(self, keys) -> list:
+        """Return the current indices of style keys, skipping styles that no longer exist."""
+        return [self._index_by_key[key] for key in keys if key in self._index_by_key]
+
+def style_key(style_text: str) -> str:
+    """Return a stable identifier for a font template."""
+    return hashlib.sha256(style_text.encode()).hexdigest()[:16]
+
+# Words in Unicode character names that end the "family" part ("CIRCLED LATIN CAPITAL LETTER A")
+FAMILY_STOP_WORDS = {"LETTER", "CAPITAL", "SMALL", "DIGIT", "WITH", "FOR"}
+# Words too common to be useful search terms
+FAMILY_GENERIC_WORDS = {"MATHEMATICAL", "LATIN", "SIGN", "MARK", "SYMBOL", "COMBINING"}
+# Unicode categories of combining marks and format characters
+INVISIBLE_CATEGORIES = {"Mn", "Me", "Cf"}
+# Extra search terms for families whose Unicode name differs from the common one
+FAMILY_ALIASES = {
+    "modifier": "superscript",
+    "overlay": "strikethrough",
+    "struck": "doublestruck",
+    "fullwidth": "wide",
+    "negative": "filled",
 }
 
-# New stylish fonts
-STYLISH_FONTS = [
-    "𝙉𝘼𝙈𝙀 𝙈𝘼𝙆𝙀𝙍",
-    "ᶦ ͢ᵃᵐ⛦⃕‌!❛𝆺𝅥⤹࿗𓆪ꪾ™",
-    "🔥!⃪⍣꯭꯭𓆪꯭🝐",
-    "!✦ 𝆺𝅥⎯ꨄ",
-    ".𝁘ໍ!𓆪ִֶָ ֺ⎯꯭‌ 𓆩💗𓆪𓈒",
-    "𝅃꯭᳚𓄂️𝆺𝅥⃝🔥 ⃪ͥ͢ ᷟ𓆩 ! 乛|⁪⁬⁮⁮⁮⁮ ‌⁪⁬𓆪™",
-    "𝅃꯭᳚🦁!˶꯭꯭꯭꯭꯭꯭֟፝͟͝ ⚡꯭꯭꯭꯭꯭",
-    "❥‌‌❥ ⃝⃪⃕🦚⟵᷽᷍!˚‌‌‌‌◡‌⃝🐬᪳ ‌⃪𔘓❁‌‌❍•:➛",
-    "𝅥‌꯭𝆬‌🦋⃪꯭ ─⃛͢┼ 𝞄⃕𝖋𝖋 !🥵⃝⃝ᬽ꯭ ⃪꯭ ꯭𝅥‌꯭𝆬‌➺꯭⎯⎯᪵᪳",
-    "𝅃!™ ٭ - 𓆪ꪾ⌯ 🜲 ˹ 𝐎ᴘ ˼",
-    "𝐈тᷟʑ꯭ͤ𓄂︪︫︠𓆩〭〬!⍣⃪͜ ꭗ̥̽𝆺꯭𝅥𔘓༌🪽⎯꯭̽⎯꯭ ꯭",
-    "𓏲!𓂃ֶꪳ 𓆩〭〬🦋𓆪ꪾ",
-    "⎯꯭꯭֯‌⌯ !𓂃ֶꪳ 𓆩〭〬🔥𓆪ꪾ",
-    "𝆺𝅥⃝🤍 ⃪ͥ͢ ᷟ ●!🤍᪳𝆺꯭𝅥⎯꯭̽⎯꯭",
-    "⋆⎯፝֟፝֟⎯᪵ 𝆺꯭𝅥! ᭄꯭🦋꯭᪳᪳᪻⎯̽⎯🐣",
-    "⟶̽ꭙ⋆\"🔥𓆩〬 !⎯᳝֟፝֟⎯‌ꭙ⋆\"🔥",
-    "⟶̽ꭙ⋆\"🔥𓆩〬 !🤍᪳𝆺꯭𝅥⎯᳝֟፝֟⎯‌",
-    "─፝─᪵།‌꯭! ا۬͢𝆺𝅥⃝🌸𝄄꯭꯭𝄄꯭꯭ ̶꯭𝅥ͦ 𝆬👑",
-    ".𝁘ໍ!ꨄ 🦋𓂃•",
-    "⟶̽𓆩〬𝁘ໍ!𓂃˖ॐ🪼⎯᳝֟፝⎯‌ꭙ⋆\"",
-    "͟͞ !𓂃 🔥𝆺𝅥 🜲 ⌯",
-    "⎯꯭꯭֯‌!𓂃ֶꪳ 𓆩〭〬🔥𓆪ꪾ",
-    ".𝁘ໍ⎯꯭̽- !⌯ 𝘅𝗗 𓂃⎯꯭‌ ִֶָ ֺ🎀",
-    "❛ ⟶̽! ❜ 🌙⤹🌸",
-    "⏤͟͞●!●───♫▷",
-    "𝐓𝐫𝐚𝐝𝐢𝐭𝐢𝐨𝐧𝐚𝐥 𝐁𝐨𝐥𝐝: 𝐍𝐀𝐌𝐄",
-    "𝑇𝑟𝑎𝑑𝑖𝑡𝑖𝑜𝑛𝑎𝑙 𝐼𝑡𝑎𝑙𝑖𝑐: 𝑁𝐴𝑀𝐸",
-    "𝑻𝒓𝒂𝒅𝒊𝒕𝒊𝒐𝒏𝒂𝒍 𝑩𝒐𝒍𝒅 𝑰𝒕𝒂𝒍𝒊𝒄: 𝑵𝑨𝑴𝑬",
-    "ᴛʀᴀᴅɪᴛɪᴏɴᴀʟ sᴍᴀʟʟᴄᴀᴘs: ɴᴀᴍᴇ",
-    "ₜᵣₐdᵢₜᵢₒₙₐₗ ₛᵤbₛcᵣᵢₚₜ: ₙₐₘₑ",
-    "ᵗʳᵃᵈⁱᵗⁱᵒⁿᵃˡ ˢᵘᵖᵉʳˢᶜʳⁱᵖᵗ: ⁿᵃᵐᵉ",
-    "𝓣𝓻𝓪𝓭𝓲𝓽𝓲𝓸𝓷𝓪𝓵 𝓢𝓬𝓻𝓲𝓹𝓽: 𝓝𝓐𝓜𝓔",
-    "𝕋𝕣𝕒𝕕𝕚𝕥𝕚𝕠𝕟𝕒𝕝 𝔻𝕠𝕦𝕓𝕝𝕖: ℕ𝔸𝕄𝔼",
-    "Ⓣⓡⓐⓓⓘⓣⓘⓞⓝⓐⓛ Ⓒⓘⓡⓒⓛⓔⓓ: ⓃⒶⓂⒺ",
-    "🅣🅡🅐🅓🅘🅣🅘🅞🅝🅐🅛 🅢🅠🅤🅐🅡🅔🅓: 🅝🅐🅜🅔",
-    "𝗧𝗿𝗮𝗱𝗶𝘁𝗶𝗼𝗻𝗮𝗹 𝗦𝗮𝗻𝘀 𝗕𝗼𝗹𝗱: 𝗡𝗔𝗠𝗘",
-    "𝘛𝘳𝘢𝘥𝘪𝘵𝘪𝘰𝘯𝘢𝘭 𝘚𝘢𝘯𝘴 𝘐𝘵𝘢𝘭𝘪𝘤: 𝘕𝘈𝘔𝘌",
-    "𝗕𝗼𝗹𝗱 𝗦𝗮𝗻𝘀: 𝗡𝗔𝗠𝗘",
-    "𝐁𝐨𝐥𝐝 𝐒𝐞𝐫𝐢𝐟: 𝐍𝐀𝐌𝐄",
-    "𝘊𝘰𝘥𝘦𝘥 𝘐𝘵𝘢𝘭𝘪𝘤: 𝘕𝘈𝘔𝘌",
-    "𝘿𝙚𝙣𝙨𝙚 𝙄𝙩𝙖𝙡𝙞𝙘: 𝙉𝘼𝙈𝙀",
-    "𝔉𝔯𝔞𝔠𝔱𝔲𝔯 𝔊𝔬𝔱𝔥𝔦𝔠: 𝔑𝔄𝔐𝔈",
-    "𝕭𝖑𝖆𝖈𝖐𝖑𝖊𝖙𝖙𝖊𝖗: 𝕹𝕬𝕸𝕰",
-    "ℍ𝕠𝕡𝕡𝕪 𝔻𝕠𝕦𝕓𝕝𝕖: ℕ𝔸𝕄𝔼",
-    "🅂🆀🆄🅰️🆁🅴🆂: 🄽🄰🄼🄴",
-    "ⒸⒾⓇⒸⓁⒺⒹ: ⓃⒶⓂⒺ",
-    "Ꮒꮛꮛꮢ ᏚꮯꮢꭵᏢᏆ: ᏁᎪᎷᎬ",
-    "нєєя ƒαη¢у: иαмє",
-    "Ｆｕｌｌ　Ｗｉｄｔｈ: ＮＡＭＥ",
-    "ん乇乇尺 Jαραɳҽʂҽ: 刀卂爪乇",
-    "ɦεε૨ ɭεεͳ: ȵȺɱΣ",
-    "𝚂𝚖𝚊𝚕𝚕 𝙲𝚊𝚙𝚜: 𝙽𝙰𝙼𝙴",
-    "Ꞓɇłŧɨȼ Șŧɏłɇ: ꞐȺⱮɆ",
-    "𝚪𝚸𝚬𝚬𝚱: 𝚴𝚨𝚳𝚬",
-    "𝜧𝜶𝜻𝜣 𝜮𝜸𝜹𝜾𝜫𝜻: 𝜨𝜜𝜧𝜠",
-    "Ⲙⲓⲭⲉⲇ Ⲧⲩⲡⲉ: ⲚⲀⲘⲈ",
-    "U̶n̶i̶c̶o̶d̶e̶ C̶o̶r̶r̶u̶p̶t̶: NAME",
-    "NAME Style with Stars",
-    "▌│█║▌║▌║ NAME ║▌║▌║█│▌",
-    "▁ ▂ ▄ ▅ ▆ ▇ █ NAME █ ▇ ▆ ▅ ▄ ▂ ▁",
-    "BoxStyle NAME BoxStyle",
-    "꧁༒☬ NAME ☬༒꧂",
-    "░▒▓█►─═  NAME ═─◄█▓▒░",
-    "✿❀ NAME ❀✿",
-    "Special NAME Style",
-    "✰✰NAME✰✰"
-]
+def style_tokens(style_text: str) -> set:
+    """Return the search terms for a font template.
+
+    Terms come from the template's label, read through NFKC so that e.g.
+    "𝔉𝔯𝔞𝔠𝔱𝔲𝔯" becomes "fractur", and from the Unicode names of its
+    decoration characters, e.g. "fraktur", "circled" or "box".
+    """
+    label = unicodedata.normalize("NFKC", style_text).replace("NAME", " ").lower()
+    tokens = set(re.findall(r"[a-z]{2,}", label))
+    for char in set(style_text):
+        if ord(char) < 128:
+            continue
+        # Combining marks and format characters (joiners, variation selectors)
+        # have names like "COMBINING DOUBLE ..." that describe nothing visible;
+        # they only contribute aliases such as "overlay" -> "strikethrough"
+        invisible = unicodedata.category(char) in INVISIBLE_CATEGORIES
+        for word in unicodedata.name(char, "").replace("-", " ").split():
+            if word in FAMILY_STOP_WORDS:
+                break
+            if word in FAMILY_GENERIC_WORDS or not word.isalpha():
+                continue
+            word = word.lower()
+            if not invisible:
+                tokens.add(word)
+            if word in FAMILY_ALIASES:
+                tokens.add(FAMILY_ALIASES[word])
+    return tokens
+
+class StyleSearchIndex:
+    """Prefix and fuzzy search over style labels and the Unicode families they use."""
+
+    def __init__(self, fonts: tuple):
+        self.postings = {}  # term -> set of style indices
+        for idx, font in enumerate(fonts):
+            for token in style_tokens(font):
+                self.postings.setdefault(token, set()).add(idx)
+        self.tokens = sorted(self.postings)
+
+    def search(self, term: str) -> list:
+        """Return sorted indices of styles matching every word of term.
+
+        Each word matches terms it is a prefix of; a word without prefix
+        matches falls back to close (fuzzy) matches.
+        """
+        result = None
+        for word in re.findall(r"\w+", term.lower()):
+            start = bisect.bisect_left(self.tokens, word)
+            matched = []
+            for token in self.tokens[start:]:
+                if not token.startswith(word):
+                    break
+                matched.append(token)
+            if not matched:
+                matched = difflib.get_close_matches(word, self.tokens, n=5, cutoff=0.75)
+            indices = set().union(*(self.postings[token] for token in matched))
+            result = indices if result is None else result & indices
+        return sorted(result or ())
+
+def split_template(style_text: str) -> tuple:
+    """Split a font template at its placeholder ("NAME", else "!")."""
+    if "NAME" in style_text:
+        return tuple(style_text.split("NAME"))
+    if "!" in style_text:
+        return tuple(style_text.split("!"))
+    return (style_text,)
+
+def compile_catalog(path: str) -> StyleCatalog:
+    """Load and validate the style catalog from its JSON source.
+
+    Compiling takes well under a millisecond, so there is no on-disk cache.
+    Raises ValueError if the file does not have the expected shape.
+    """
+    with open(path, 'rb') as f:
+        source = f.read()
+    version = hashlib.sha256(source).hexdigest()[:16]
+    data = json.loads(source)
+    fonts = data.get("fonts") if isinstance(data, dict) else None
+    chars = data.get("chars") if isinstance(data, dict) else None
+    if not fonts or not isinstance(fonts, list) or not all(isinstance(font, str) for font in fonts):
+        raise ValueError("'fonts' must be a non-empty list of strings")
+    if not isinstance(chars, dict) or not all(
+        isinstance(glyphs, list) and glyphs and all(isinstance(glyph, str) for glyph in glyphs)
+        for glyphs in chars.values()
+    ):
+        raise ValueError("'chars' must map characters to non-empty lists of strings")
+    return StyleCatalog(
+        tuple(fonts),
+        tuple(split_template(font) for font in fonts),
+        {char: tuple(glyphs) for char, glyphs in chars.items()},
+        version,
+    )
+
+# Style catalog source file, compiled lazily on first use
+STYLES_FILE = os.getenv('STYLES_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'styles.json'))
+CATALOG_POLL_INTERVAL = float(os.getenv('CATALOG_POLL_INTERVAL', 30))
+_catalog = None
+_catalog_mtime = None
+
+def get_catalog() -> StyleCatalog:
+    """Return the current style catalog, compiling it on first use."""
+    if _catalog is None:
+        reload_catalog()
+    return _catalog
+
+def reload_catalog() -> bool:
+    """Recompile the catalog from STYLES_FILE and swap it in atomically.
+
+    On failure the previous catalog stays active. Rendered-style caches are
+    cleared because style indices may have changed.
+    """
+    global _catalog, _catalog_mtime
+    try:
+        mtime = os.path.getmtime(STYLES_FILE)
+        catalog = compile_catalog(STYLES_FILE)
+    except Exception as e:
+        logger.error(f"Could not load style catalog from {STYLES_FILE}: {e}")
+        if _catalog is None:
+            raise
+        return False
+    _catalog_mtime = mtime
+    if _catalog is not None and catalog.version == _catalog.version:
+        return False
+    _catalog = catalog
+    for cache in (RESULT_CACHE, KEYBOARD_CACHE, INLINE_CACHE):
+        cache.clear()
+    logger.info(f"Loaded style catalog {catalog.version} with {len(catalog)} styles")
+    return True
+
+async def watch_catalog() -> None:
+    """Reload the catalog whenever STYLES_FILE changes on disk."""
+    while True:
+        await asyncio.sleep(CATALOG_POLL_INTERVAL)
+        try:
+            if os.path.getmtime(STYLES_FILE) != _catalog_mtime:
+                reload_catalog()
+        except OSError as e:
+            logger.error(f"Could not check style catalog: {e}")
 
 def generate_stylish_name(name: str) -> str:
     """Generate a stylish version of the given name."""
-    stylish_name = ""
-    for char in name.lower():
-        if char in STYLISH_CHARS:
-            stylish_name += random.choice(STYLISH_CHARS[char])
-        elif char in string.ascii_letters:
-            stylish_name += char
-        else:
-            stylish_name += char
-    return stylish_name
+    return get_catalog().engine.render(name)
 
 def get_stylish_font(name: str) -> str:
     """Get a random stylish font for the name."""
-    return random.choice(STYLISH_FONTS).replace("NAME", name)
+    return random.choice(get_catalog().fonts).replace("NAME", name)
 
-def create_style_buttons(name: str, page: int = 0) -> InlineKeyboardMarkup:
-    """Create buttons for all styles in a 5x5 grid."""
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a fixed TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def peek(self, key, default=None):
+        """Like get, but without counting a hit or miss or refreshing the LRU order."""
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return default
+
+    def set(self, key, value) -> None:
+        """Store value under key, evicting the least recently used entries."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters for logging and monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class Session:
+    """Server-side state for one styled name, referenced by a short token."""
+
+    __slots__ = ("token", "name", "seed", "expires_at")
+
+    def __init__(self, token: str, name: str, seed: int, expires_at: float):
+        self.token = token
+        self.name = name
+        self.seed = seed
+        self.expires_at = expires_at  # wall-clock expiry of the SQLite row
+
+class SessionStore:
+    """Token -> Session map with LRU/TTL eviction and optional SQLite backing.
+
+    Sessions are shared by name while they are alive, so popular names reuse
+    the same token (and therefore the same cached keyboards). Sessions never
+    change after creation, so each is written to SQLite once; reusing a
+    session pushes its row's expiry out again once half the TTL has passed.
+    All SQLite reads and writes run off the event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, db_path: str = None):
+        self.ttl = ttl
+        self._sessions = TTLCache(maxsize, ttl)
+        self._tokens_by_name = TTLCache(maxsize, ttl)
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "token TEXT PRIMARY KEY, name TEXT NOT NULL, seed INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS sessions_name ON sessions (name)")
+            self._db.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    async def open(self, name: str) -> Session:
+        """Return the live session for name, creating one if needed."""
+        token = self._tokens_by_name.get(name)
+        session = await self.get(token) if token else None
+        if session is None and self._db is not None:
+            row = await asyncio.to_thread(
+                self._query,
+                "SELECT token, name, seed, expires_at FROM sessions WHERE name = ? AND expires_at > ?", name
+            )
+            if row:
+                session = Session(*row)
+                self._touch(session)
+        if session is None:
+            session = Session(
+                secrets.token_urlsafe(6), name, random.getrandbits(32), time.time() + self.ttl
+            )
+            self._persist(session)
+        self._remember(session)
+        return session
+
+    async def get(self, token: str):
+        """Look up a session by token, falling back to SQLite after a restart."""
+        session = self._sessions.get(token)
+        if session is None and self._db is not None:
+            row = await asyncio.to_thread(
+                self._query,
+                "SELECT token, name, seed, expires_at FROM sessions WHERE token = ? AND expires_at > ?", token
+            )
+            if row:
+                session = Session(*row)
+        if session is not None:
+            self._touch(session)
+            self._remember(session)
+        return session
+
+    def _query(self, sql: str, key: str):
+        try:
+            with self._db_lock:
+                return self._db.execute(sql, (key, time.time())).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error loading session {key}: {e}")
+            return None
+
+    def _remember(self, session: Session) -> None:
+        self._sessions.set(session.token, session)
+        self._tokens_by_name.set(session.name, session.token)
+
+    def _touch(self, session: Session) -> None:
+        # Keep the row alive as long as the session is in use
+        if session.expires_at - time.time() < self.ttl / 2:
+            session.expires_at = time.time() + self.ttl
+            self._persist(session)
+
+    def _persist(self, session: Session) -> None:
+        if self._db is None:
+            return
+        row = (session.token, session.name, session.seed, session.expires_at)
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self._write, row)
+        except RuntimeError:
+            # No event loop (e.g. a script): write inline
+            self._write(row)
+
+    def _write(self, row: tuple) -> None:
+        try:
+            with self._db_lock:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO sessions (token, name, seed, expires_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        row,
+                    )
+        except sqlite3.Error as e:
+            logger.error(f"Error persisting session {row[0]}: {e}")
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+SESSIONS = SessionStore(
+    maxsize=int(os.getenv('SESSION_STORE_SIZE', 10000)),
+    ttl=float(os.getenv('SESSION_TTL', 86400)),
+    db_path=os.getenv('SESSION_DB'),
+)
+
+class UserRecord:
+    """A user's favorite style keys (see style_key) and most recent names (newest first)."""
+
+    __slots__ = ("favorites", "recent")
+
+    def __init__(self, favorites: list = None, recent: list = None):
+        self.favorites = favorites or []
+        self.recent = recent or []
+
+class UserChanges:
+    """A user's changes not yet written: names used and favorites added or removed."""
+
+    __slots__ = ("recent", "favorites")
+
+    def __init__(self):
+        self.recent = {}     # name -> time it was used
+        self.favorites = {}  # style key -> time it was added, or None if removed
+
+    def __len__(self) -> int:
+        return len(self.recent) + len(self.favorites)
+
+    def apply(self, record: UserRecord, history_size: int, max_favorites: int) -> None:
+        """Replay the changes onto a record freshly loaded from SQLite."""
+        for name, _ in sorted(self.recent.items(), key=lambda item: item[1]):
+            if name in record.recent:
+                record.recent.remove(name)
+            record.recent.insert(0, name)
+        del record.recent[history_size:]
+        for key, added_at in self.favorites.items():
+            if added_at is None:
+                if key in record.favorites:
+                    record.favorites.remove(key)
+            elif key not in record.favorites:
+                record.favorites.append(key)
+        del record.favorites[:-max_favorites]
+
+    def merge_older(self, older: "UserChanges") -> None:
+        """Take back changes from a failed write, unless superseded by newer ones."""
+        for name, used_at in older.recent.items():
+            self.recent.setdefault(name, used_at)
+        for key, added_at in older.favorites.items():
+            self.favorites.setdefault(key, added_at)
+
+class UserStore:
+    """Per-user favorites and history in SQLite (WAL), written behind in batches.
+
+    Active users are served from a warm in-memory cache. Each change is kept
+    in memory as a row-level change (one name used, one favorite added or
+    removed); a background task writes them in one transaction every
+    `flush_interval` seconds from a worker thread, so handlers never wait on
+    disk writes. Rows are merged per name and per favorite rather than per
+    user, so several processes sharing the database (see WorkerPool) never
+    overwrite each other's changes, and a cache miss re-reads the rows.
+    """
+
+    def __init__(self, db_path: str, cache_size: int, history_size: int = 10,
+                 max_favorites: int = 25, flush_interval: float = 2.0, cache_ttl: float = 3600):
+        self.db_path = db_path
+        self.history_size = history_size
+        self.max_favorites = max_favorites
+        self.flush_interval = flush_interval
+        self.cache = TTLCache(cache_size, ttl=cache_ttl)
+        self.writes = 0
+        self._dirty = {}     # user_id -> UserChanges waiting to be written
+        self._flushing = {}  # user_id -> UserChanges being written right now
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._task = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Only called from worker threads while holding _db_lock
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS favorites ("
+                "user_id INTEGER NOT NULL, style_key TEXT NOT NULL, added_at REAL NOT NULL, "
+                "PRIMARY KEY (user_id, style_key))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS recent ("
+                "user_id INTEGER NOT NULL, name TEXT NOT NULL, used_at REAL NOT NULL, "
+                "PRIMARY KEY (user_id, name))"
+            )
+            self._db.commit()
+        return self._db
+
+    def _load(self, user_id: int) -> UserRecord:
+        with self._db_lock:
+            db = self._connect()
+            favorites = db.execute(
+                "SELECT style_key FROM favorites WHERE user_id = ? ORDER BY added_at", (user_id,)
+            ).fetchall()
+            recent = db.execute(
+                "SELECT name FROM recent WHERE user_id = ? ORDER BY used_at DESC LIMIT ?",
+                (user_id, self.history_size),
+            ).fetchall()
+        return UserRecord([row[0] for row in favorites], [row[0] for row in recent])
+
+    def _write(self, batch: dict) -> int:
+        recent = [
+            (user_id, name, used_at)
+            for user_id, changes in batch.items() for name, used_at in changes.recent.items()
+        ]
+        added = [
+            (user_id, key, added_at)
+            for user_id, changes in batch.items() for key, added_at in changes.favorites.items()
+            if added_at is not None
+        ]
+        removed = [
+            (user_id, key)
+            for user_id, changes in batch.items() for key, added_at in changes.favorites.items()
+            if added_at is None
+        ]
+        with self._db_lock:
+            db = self._connect()
+            with db:
+                db.executemany(
+                    "INSERT INTO recent (user_id, name, used_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_id, name) DO UPDATE SET used_at = max(used_at, excluded.used_at)",
+                    recent,
+                )
+                db.executemany(
+                    "INSERT INTO favorites (user_id, style_key, added_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_id, style_key) DO NOTHING",
+                    added,
+                )
+                db.executemany("DELETE FROM favorites WHERE user_id = ? AND style_key = ?", removed)
+                # Keep each user's history and favorites within their limits
+                db.executemany(
+                    "DELETE FROM recent WHERE user_id = ? AND name NOT IN ("
+                    "SELECT name FROM recent WHERE user_id = ? ORDER BY used_at DESC LIMIT ?)",
+                    [(user_id, user_id, self.history_size) for user_id in batch],
+                )
+                db.executemany(
+                    "DELETE FROM favorites WHERE user_id = ? AND style_key NOT IN ("
+                    "SELECT style_key FROM favorites WHERE user_id = ? ORDER BY added_at DESC LIMIT ?)",
+                    [(user_id, user_id, self.max_favorites) for user_id in batch],
+                )
+        return len(recent) + len(added) + len(removed)
+
+    async def get(self, user_id: int) -> UserRecord:
+        """Return the user's record for display, or an empty one if it cannot be loaded."""
+        try:
+            return await self._get(user_id)
+        except sqlite3.Error as e:
+            logger.error(f"Could not load user {user_id}: {e}")
+            # Not cached, so the next request tries the database again
+            return UserRecord()
+
+    async def _get(self, user_id: int) -> UserRecord:
+        """Return the user's record, loading it from SQLite on a cache miss.
+
+        Raises sqlite3.Error if it cannot be loaded.
+        """
+        record = self.cache.get(user_id)
+        if record is None:
+            record = await asyncio.to_thread(self._load, user_id)
+            cached = self.cache.peek(user_id)
+            if cached is not None:
+                # A concurrent request loaded the user first; it may have changed since
+                return cached
+            # Changes not written yet are not in the rows we just read
+            for pending in (self._flushing.get(user_id), self._dirty.get(user_id)):
+                if pending is not None:
+                    pending.apply(record, self.history_size, self.max_favorites)
+            self.cache.set(user_id, record)
+        return record
+
+    def _changes(self, user_id: int) -> UserChanges:
+        changes = self._dirty.get(user_id)
+        if changes is None:
+            changes = self._dirty[user_id] = UserChanges()
+        return changes
+
+    async def add_recent(self, user_id: int, name: str) -> None:
+        self._changes(user_id).recent[name] = time.time()
+        # Only a cached record needs updating; a later load replays the change
+        record = self.cache.peek(user_id)
+        if record is not None:
+            if name in record.recent:
+                record.recent.remove(name)
+            record.recent.insert(0, name)
+            del record.recent[self.history_size:]
+
+    async def toggle_favorite(self, user_id: int, key: str) -> bool:
+        """Add or remove a favorite style by its key; returns True if it is now a favorite.
+
+        Raises sqlite3.Error if the user's favorites cannot be loaded.
+        """
+        record = await self._get(user_id)
+        if key in record.favorites:
+            record.favorites.remove(key)
+            self._changes(user_id).favorites[key] = None
+            return False
+        record.favorites.append(key)
+        del record.favorites[:-self.max_favorites]
+        self._changes(user_id).favorites[key] = time.time()
+        return True
+
+    async def flush(self) -> None:
+        """Write all pending changes to SQLite in one transaction."""
+        if not self._dirty or self._flushing:
+            return
+        self._flushing, self._dirty = self._dirty, {}
+        try:
+            self.writes += await asyncio.to_thread(self._write, self._flushing)
+        except sqlite3.Error as e:
+            logger.error(f"Could not write changes of {len(self._flushing)} users: {e}")
+            # Retry on the next flush, behind anything that changed meanwhile
+            for user_id, changes in self._flushing.items():
+                self._changes(user_id).merge_older(changes)
+        finally:
+            self._flushing = {}
+
+    def start(self) -> None:
+        """Start the write-behind flush task on the running event loop."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write any remaining changes."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def pending(self) -> int:
+        return sum(len(changes) for changes in self._dirty.values())
+
+USERS = UserStore(
+    db_path=os.getenv('USER_DB', 'stylish_name_bot.db'),
+    cache_size=int(os.getenv('USER_CACHE_SIZE', 10000)),
+    flush_interval=float(os.getenv('USER_FLUSH_INTERVAL', 2)),
+    # Other workers may change a user's rows, so worker processes re-read them sooner
+    cache_ttl=float(os.getenv('USER_CACHE_TTL', 3600 if WORKERS <= 1 else 30)),
+)
+
+# Final style texts keyed by (name, style index, seed)
+RESULT_CACHE = TTLCache(
+    maxsize=int(os.getenv('RESULT_CACHE_SIZE', 50000)),
+    ttl=float(os.getenv('SESSION_TTL', 86400)),
+)
+
+def render_style(name: str, style_idx: int, seed: int) -> str:
+    """Render one style for a name, reproducibly for a given seed.
+
+    All styles of (name, seed) are drawn from a single seeded batch, so the
+    text for a style does not depend on which page asked for it first. The
+    whole batch is stored in RESULT_CACHE, making later previews and picks
+    plain lookups.
+    """
+    key = (name, style_idx, seed)
+    text = RESULT_CACHE.get(key)
+    if text is None:
+        texts = render_all_styles(name, seed)
+        for idx, style_text in enumerate(texts):
+            RESULT_CACHE.set((name, idx, seed), style_text)
+        text = texts[style_idx]
+    return text
+
+def render_all_styles(name: str, seed: int) -> list:
+    """Render every style of the catalog for a name from one seeded batch, uncached."""
+    catalog = get_catalog()
+    stylish_names = catalog.engine.render_batch(name, len(catalog), random.Random(seed))
+    return [catalog.apply(idx, stylish_name) for idx, stylish_name in enumerate(stylish_names)]
+
+# Rendered keyboards keyed by (session token, page)
+KEYBOARD_CACHE = TTLCache(
+    maxsize=int(os.getenv('KEYBOARD_CACHE_SIZE', 2048)),
+    ttl=float(os.getenv('KEYBOARD_CACHE_TTL', 600)),
+)
+
+def style_button_rows(session: Session, indices) -> list:
+    """Create a 5x5 grid of preview buttons for up to 25 style indices."""
+    indices = list(indices)[:25]
     buttons = []
-    start_idx = page * 25  # 5x5 = 25 buttons per page
-    end_idx = min(start_idx + 25, len(STYLISH_FONTS))
     
     # Create 5 rows of 5 buttons each
     for row in range(5):
         current_row = []
         for col in range(5):
-            idx = start_idx + (row * 5) + col
-            if idx < end_idx:
-                style_text = STYLISH_FONTS[idx]
-                stylish_name = generate_stylish_name(name)
-                
+            position = (row * 5) + col
+            if position < len(indices):
+                idx = indices[position]
                 # Create preview text
-                preview_text = style_text
-                if "NAME" in preview_text:
-                    preview_text = preview_text.replace("NAME", stylish_name)
-                elif "!" in preview_text:
-                    preview_text = preview_text.replace("!", stylish_name)
+                preview_text = render_style(session.name, idx, session.seed)
                 
                 # Limit preview length if too long
                 if len(preview_text) > 15:  # Reduced length for 5x5 grid
@@ -240,7 +1187,7 @@ def create_style_buttons(name: str, page: int = 0) -> InlineKeyboardMarkup:
                 
                 current_row.append(InlineKeyboardButton(
                     preview_text,
-                    callback_data=f"style_{name}_{idx}"
+                    callback_data=f"s:{session.token}:{idx}"
                 ))
             else:
                 # Add empty button to maintain grid
@@ -250,81 +1197,1116 @@ def create_style_buttons(name: str, page: int = 0) -> InlineKeyboardMarkup:
                 ))
         
         buttons.append(current_row)
+    return buttons
+
+def create_style_buttons(session: Session, page: int = 0) -> InlineKeyboardMarkup:
+    """Create buttons for all styles in a 5x5 grid."""
+    start_idx = page * 25  # 5x5 = 25 buttons per page
+    style_count = len(get_catalog())
+    end_idx = min(start_idx + 25, style_count)
+    buttons = style_button_rows(session, range(start_idx, end_idx))
     
     # Add navigation buttons
     nav_buttons = []
     if page > 0:
-        nav_buttons.append(InlineKeyboardButton("⬅️ Previous", callback_data=f"page_{name}_{page-1}"))
-    if end_idx < len(STYLISH_FONTS):
-        nav_buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"page_{name}_{page+1}"))
-    if nav_buttons:
-        buttons.append(nav_buttons)
+        nav_buttons.append(InlineKeyboardButton("⬅️ Previous", callback_data=f"p:{session.token}:{page-1}"))
+    nav_buttons.append(InlineKeyboardButton("⭐ Favorites", callback_data=f"f:{session.token}:0"))
+    if end_idx < style_count:
+        nav_buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"p:{session.token}:{page+1}"))
+    buttons.append(nav_buttons)
     
     return InlineKeyboardMarkup(buttons)
 
+def get_style_keyboard(session: Session, page: int = 0) -> InlineKeyboardMarkup:
+    """Return the style keyboard for (session, page), rendering it on a cache miss."""
+    key = (session.token, page)
+    reply_markup = KEYBOARD_CACHE.get(key)
+    if reply_markup is None:
+        reply_markup = create_style_buttons(session, page)
+        KEYBOARD_CACHE.set(key, reply_markup)
+    return reply_markup
+
+def get_favorites_keyboard(session: Session, favorites: list) -> InlineKeyboardMarkup:
+    """Return the "⭐ Favorites" page: a user's favorite styles plus a link to all styles."""
+    key = (session.token, "fav", tuple(favorites))
+    reply_markup = KEYBOARD_CACHE.get(key)
+    if reply_markup is None:
+        buttons = style_button_rows(session, favorites)
+        buttons.append([InlineKeyboardButton("All styles ➡️", callback_data=f"p:{session.token}:0")])
+        reply_markup = InlineKeyboardMarkup(buttons)
+        KEYBOARD_CACHE.set(key, reply_markup)
+    return reply_markup
+
+async def get_favorites(user_id: int) -> list:
+    """Return the current catalog indices of the user's favorite styles."""
+    return get_catalog().resolve((await USERS.get(user_id)).favorites)
+
+def get_search_keyboard(session: Session, term: str, indices: list) -> InlineKeyboardMarkup:
+    """Return a single keyboard with the styles matching a /find term."""
+    key = (session.token, "find", term)
+    reply_markup = KEYBOARD_CACHE.get(key)
+    if reply_markup is None:
+        reply_markup = InlineKeyboardMarkup(style_button_rows(session, indices))
+        KEYBOARD_CACHE.set(key, reply_markup)
+    return reply_markup
+
 async def start(update: Update, context: CallbackContext) -> None:
     """Send a message when the command /start is issued."""
     welcome_message = (
         "👋 Welcome to the Stylish Name Bot! 🎨\n\n"
         "Use /style <your name> to generate a stylish version of your name.\n"
-        "Example: /style John"
+        "Example: /style John\n\n"
+        "Know the style you want? Use /find <style> <name>, e.g. /find fraktur John\n\n"
+        "To style many names at once, send /bulk followed by one name per line, "
+        "or upload a .txt file with one name per line."
     )
-    await update.message.reply_text(welcome_message)
+    await DISPATCHER.call(PRIORITY_SEND, update.effective_chat.id, update.message.reply_text, welcome_message)
 
 async def style(update: Update, context: CallbackContext) -> None:
     """Generate and send a stylish version of the provided name."""
+    user_id = update.effective_user.id
     if not context.args:
-        await update.message.reply_text("Please provide a name to style. Example: /style John")
+        text = "Please provide a name to style. Example: /style John"
+        reply_markup = None
+        recent = (await USERS.get(user_id)).recent
+        if recent:
+            text += "\n\nOr pick one of your recent names:"
+            sessions = await asyncio.gather(*(SESSIONS.open(recent_name) for recent_name in recent[:5]))
+            reply_markup = InlineKeyboardMarkup([
+                [InlineKeyboardButton(session.name, callback_data=f"p:{session.token}:0")]
+                for session in sessions
+            ])
+        await DISPATCHER.call(
+            PRIORITY_SEND, update.effective_chat.id,
+            update.message.reply_text, text, reply_markup=reply_markup
+        )
         return
 
     name = " ".join(context.args)
-    stylish_name = generate_stylish_name(name)
+    session = await SESSIONS.open(name)
+    await USERS.add_recent(user_id, name)
     
-    response = f"✨ Your name: {name}\n\n"
-    response += "Choose a style from the buttons below:"
+    # Users with favorites start on their "⭐ Favorites" page
+    favorites = await get_favorites(user_id)
+    if favorites:
+        response = f"✨ Your name: {name}\n\n⭐ Your favorite styles:"
+        reply_markup = get_favorites_keyboard(session, favorites)
+    else:
+        response = f"✨ Your name: {name}\n\n"
+        response += "Choose a style from the buttons below:"
+        reply_markup = get_style_keyboard(session)
+    await DISPATCHER.call(
+        PRIORITY_SEND, update.effective_chat.id,
+        update.message.reply_text, response, reply_markup=reply_markup
+    )
+
+async def find(update: Update, context: CallbackContext) -> None:
+    """Show only the styles matching a search term, e.g. /find fraktur John."""
+    chat_id = update.effective_chat.id
+    if len(context.args) < 2:
+        await DISPATCHER.call(
+            PRIORITY_SEND, chat_id, update.message.reply_text,
+            "Please provide a style and a name. Example: /find fraktur John"
+        )
+        return
     
-    reply_markup = create_style_buttons(name)
-    await update.message.reply_text(response, reply_markup=reply_markup)
+    term = context.args[0].lower()
+    name = " ".join(context.args[1:])
+    indices = get_catalog().search(term)
+    if not indices:
+        await DISPATCHER.call(
+            PRIORITY_SEND, chat_id, update.message.reply_text,
+            f"No styles match \"{term}\". Try e.g. bold, italic, circled, fraktur or script."
+        )
+        return
+    
+    session = await SESSIONS.open(name)
+    response = f"✨ Your name: {name}\n\n"
+    if len(indices) > 25:
+        response += f"Showing 25 of {len(indices)} styles matching \"{term}\":"
+    else:
+        response += f"Styles matching \"{term}\":"
+    await DISPATCHER.call(
+        PRIORITY_SEND, chat_id, update.message.reply_text,
+        response, reply_markup=get_search_keyboard(session, term, indices)
+    )
 
 async def button_callback(update: Update, context: CallbackContext) -> None:
     """Handle button callbacks."""
     query = update.callback_query
-    await query.answer()
     
     if query.data == "empty":
+        await DISPATCHER.call(PRIORITY_ANSWER, None, query.answer)
         return  # Do nothing for empty buttons
     
-    if query.data.startswith("style_"):
-        _, name, style_idx = query.data.split("_")
-        style_idx = int(style_idx)
-        style_text = STYLISH_FONTS[style_idx]
-        stylish_name = generate_stylish_name(name)
-        
-        # Combine style with stylish name
-        combined_text = style_text
-        if "NAME" in combined_text:
-            combined_text = combined_text.replace("NAME", stylish_name)
-        elif "!" in combined_text:
-            combined_text = combined_text.replace("!", stylish_name)
+    # Callback data is "<action>:<session token>:<number>"
+    try:
+        action, token, number = query.data.split(":")
+        number = int(number)
+    except ValueError:
+        action, token, number = None, None, 0
+    session = await SESSIONS.get(token) if token else None
+    if session is None:
+        await DISPATCHER.call(
+            PRIORITY_ANSWER, None, query.answer, "This menu has expired. Send /style <name> again."
+        )
+        return
+    chat_id = query.message.chat.id
+    user_id = query.from_user.id
+    style_count = len(get_catalog())
+    
+    if action == "a" and 0 <= number < style_count:
+        try:
+            added = await USERS.toggle_favorite(user_id, get_catalog().keys[number])
+        except sqlite3.Error as e:
+            logger.error(f"Could not update favorites of user {user_id}: {e}")
+            await DISPATCHER.call(
+                PRIORITY_ANSWER, None, query.answer, "Could not update your favorites. Please try again."
+            )
+            return
+        await DISPATCHER.call(
+            PRIORITY_ANSWER, None, query.answer,
+            "⭐ Added to favorites" if added else "Removed from favorites"
+        )
+        return
+    
+    if action == "f":
+        favorites = await get_favorites(user_id)
+        if not favorites:
+            await DISPATCHER.call(
+                PRIORITY_ANSWER, None, query.answer,
+                "No favorites yet. Pick a style and tap ⭐ to save it."
+            )
+            return
+        await DISPATCHER.call(PRIORITY_ANSWER, None, query.answer)
+        await show_keyboard(
+            query, f"✨ Your name: {session.name}\n\n⭐ Your favorite styles:",
+            get_favorites_keyboard(session, favorites)
+        )
+        return
+    
+    await DISPATCHER.call(PRIORITY_ANSWER, None, query.answer)
+    
+    if action == "s" and 0 <= number < style_count:
+        # Same seeded rendering as the button preview, normally a cache hit
+        combined_text = render_style(session.name, number, session.seed)
         
         # Send the combined text as a new message for easy copying
-        await query.message.reply_text(f"📋 Here's your stylish text:\n\n{combined_text}")
+        await DISPATCHER.call(
+            PRIORITY_SEND, chat_id,
+            query.message.reply_text, f"📋 Here's your stylish text:\n\n{combined_text}",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("⭐ Add to favorites", callback_data=f"a:{session.token}:{number}")
+            ]])
+        )
+    
+    elif action == "p" and 0 <= number * 25 < style_count:
+        page = number
+        await show_keyboard(
+            query, f"✨ Your name: {session.name}\n\nChoose a style from the buttons below:",
+            get_style_keyboard(session, page)
+        )
+
+async def show_keyboard(query, text: str, reply_markup: InlineKeyboardMarkup) -> None:
+    """Replace the callback's message with a new keyboard, or send it anew if editing fails."""
+    chat_id = query.message.chat.id
+    try:
+        # Rapid paging collapses into one edit with the latest page
+        await DISPATCHER.call(
+            PRIORITY_SEND, chat_id, query.edit_message_text,
+            text=text,
+            reply_markup=reply_markup,
+            collapse_key=("edit", chat_id, query.message.message_id)
+        )
+    except Exception as e:
+        logger.warning(f"Error updating message: {e}")
+        # If edit fails, send a new message
+        await DISPATCHER.call(
+            PRIORITY_SEND, chat_id, query.message.reply_text,
+            text=text,
+            reply_markup=reply_markup
+        )
+
+# Inline mode: results per answer (Telegram allows up to 50) and client-side cache time
+INLINE_PAGE_SIZE = 25
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', 300))
+INLINE_CACHE = TTLCache(
+    maxsize=int(os.getenv('INLINE_CACHE_SIZE', 1024)),
+    ttl=INLINE_CACHE_TIME,
+)
+
+def build_inline_results(name: str) -> list:
+    """Build one inline article per style for the name."""
+    # A seed derived from the name keeps every page of the same query consistent.
+    # The texts bypass RESULT_CACHE: the results are cached whole in INLINE_CACHE,
+    # and one query per keystroke would evict the interactive sessions' entries.
+    texts = render_all_styles(name, zlib.crc32(name.encode()))
+    style_count = len(texts)
+    results = []
+    for idx, text in enumerate(texts):
+        results.append(InlineQueryResultArticle(
+            id=str(idx),
+            title=text[:64],
+            description=f"Style {idx + 1} of {style_count}",
+            input_message_content=InputTextMessageContent(text),
+        ))
+    return results
+
+async def inline_query(update: Update, context: CallbackContext) -> None:
+    """Answer inline queries with every style of the typed name, a page at a time."""
+    query = update.inline_query
+    name = query.query.strip()
+    if not name:
+        await DISPATCHER.call(PRIORITY_ANSWER, None, query.answer, [], cache_time=INLINE_CACHE_TIME)
+        return
+    
+    results = INLINE_CACHE.get(name)
+    if results is None:
+        results = build_inline_results(name)
+        INLINE_CACHE.set(name, results)
+    
+    try:
+        offset = int(query.offset or 0)
+    except ValueError:
+        offset = 0
+    next_offset = offset + INLINE_PAGE_SIZE
+    await DISPATCHER.call(
+        PRIORITY_ANSWER, None, query.answer,
+        results[offset:next_offset],
+        cache_time=INLINE_CACHE_TIME,
+        next_offset=str(next_offset) if next_offset < len(results) else "",
+    )
+
+class ProcessorSlot:
+    """One of ChatOrderedUpdateProcessor's concurrency slots, held by a running update."""
+
+    __slots__ = ("_semaphore", "held")
+
+    def __init__(self, semaphore: asyncio.Semaphore):
+        self._semaphore = semaphore
+        self.held = False
+
+    async def acquire(self) -> None:
+        await self._semaphore.acquire()
+        self.held = True
+
+    def release(self) -> None:
+        if self.held:
+            self.held = False
+            self._semaphore.release()
+
+# The slot of the update being handled in the current task, if any
+CURRENT_SLOT = contextvars.ContextVar("current_slot", default=None)
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Update processor that runs different chats concurrently but each chat in order.
+
+    Every update is chained behind the previous update of the same chat, so a
+    slow handler only delays its own chat. The concurrency limit is applied
+    after that ordering wait; PTB's own semaphore only bounds how many updates
+    may be queued here at once. A handler gives its slot back while it waits
+    on the outbound rate limiter (see OutboundDispatcher.call).
+    """
+
+    def __init__(self, max_concurrent_updates: int, max_pending_updates: int = 1024):
+        super().__init__(max(max_pending_updates, max_concurrent_updates))
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        self._tails = {}   # chat key -> future resolved when its latest update finishes
+        self._depths = {}  # chat key -> number of queued or running updates
+        self.active = 0
+        self.processed = 0
+
+    @staticmethod
+    def _chat_key(update: object):
+        if isinstance(update, Update):
+            if update.effective_chat:
+                return update.effective_chat.id
+            if update.effective_user:
+                # Inline queries and inline-message callbacks have no chat
+                return f"user:{update.effective_user.id}"
+        return None
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        key = self._chat_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        # Claim our place in the chat's chain before the first await
+        previous = self._tails.get(key)
+        done = asyncio.get_running_loop().create_future()
+        self._tails[key] = done
+        self._depths[key] = self._depths.get(key, 0) + 1
+        try:
+            if previous is not None:
+                # asyncio.wait does not cancel `previous` if we get cancelled
+                await asyncio.wait((previous,))
+            await self._run(coroutine)
+        finally:
+            done.set_result(None)
+            self._depths[key] -= 1
+            if self._tails.get(key) is done:
+                del self._tails[key]
+                del self._depths[key]
+
+    async def _run(self, coroutine) -> None:
+        slot = ProcessorSlot(self._running)
+        await slot.acquire()
+        self.active += 1
+        token = CURRENT_SLOT.set(slot)
+        try:
+            await coroutine
+        finally:
+            CURRENT_SLOT.reset(token)
+            slot.release()
+            self.active -= 1
+            self.processed += 1
+
+    def stats(self) -> dict:
+        """Return current queue depths for logging and monitoring."""
+        queued = sum(self._depths.values())
+        return {
+            "active": self.active,
+            "waiting": max(queued - self.active, 0),
+            "chats": len(self._depths),
+            "max_chat_depth": max(self._depths.values(), default=0),
+            "processed": self.processed,
+        }
+
+    async def initialize(self) -> None:
+        """Does nothing."""
+
+    async def shutdown(self) -> None:
+        """Does nothing."""
+
+# Bulk mode limits
+BULK_MAX_NAMES = int(os.getenv('BULK_MAX_NAMES', 500))
+BULK_MAX_FILE_SIZE = int(os.getenv('BULK_MAX_FILE_SIZE', 256 * 1024))
+
+def iter_bulk_names(lines):
+    """Yield cleaned, de-duplicated names from lines of text, up to BULK_MAX_NAMES."""
+    seen = set()
+    for line in lines:
+        name = line.strip()
+        if name and name not in seen:
+            seen.add(name)
+            yield name
+            if len(seen) >= BULK_MAX_NAMES:
+                return
+
+def iter_bulk_document(names):
+    """Yield the bulk document one name section at a time."""
+    for name in names:
+        styles = render_all_styles(name, zlib.crc32(name.encode()))
+        yield f"✨ {name}\n" + "\n".join(styles) + "\n\n"
+
+def write_bulk_document(names, file) -> int:
+    """Stream the bulk document for names into file and return how many names were styled."""
+    count = 0
+    for chunk in iter_bulk_document(names):
+        file.write(chunk.encode('utf-8'))
+        count += 1
+    return count
+
+async def send_bulk_document(update: Update, lines) -> None:
+    """Style every name in lines and reply with a single text document."""
+    chat_id = update.effective_chat.id
+    names = list(iter_bulk_names(lines))
+    if not names:
+        await DISPATCHER.call(
+            PRIORITY_SEND, chat_id, update.message.reply_text,
+            "Please provide one name per line. Example:\n/bulk John\nAlice\nBob"
+        )
+        return
     
-    elif query.data.startswith("page_"):
-        _, name, page = query.data.split("_")
-        page = int(page)
+    with tempfile.TemporaryFile() as document:
+        # Rendering hundreds of names is CPU work; keep it off the event loop
+        count = await asyncio.to_thread(write_bulk_document, names, document)
+        
+        async def upload():
+            # Rewind on every attempt: a retry after RetryAfter reuses this call
+            document.seek(0)
+            return await update.message.reply_document(
+                document=document,
+                filename="stylish_names.txt",
+                caption=f"✨ {count} names in {len(get_catalog())} styles each",
+            )
+        
+        await DISPATCHER.call(PRIORITY_SEND, chat_id, upload)
+
+async def bulk(update: Update, context: CallbackContext) -> None:
+    """Style a list of names sent as /bulk followed by one name per line."""
+    parts = (update.message.text or "").split(None, 1)
+    lines = parts[1].splitlines() if len(parts) > 1 else []
+    await send_bulk_document(update, lines)
+
+async def bulk_document(update: Update, context: CallbackContext) -> None:
+    """Style a list of names uploaded as a .txt file, one name per line."""
+    document = update.message.document
+    if document.file_size and document.file_size > BULK_MAX_FILE_SIZE:
+        await DISPATCHER.call(
+            PRIORITY_SEND, update.effective_chat.id, update.message.reply_text,
+            f"That file is too large. Please send at most {BULK_MAX_FILE_SIZE // 1024} KB of names."
+        )
+        return
+    telegram_file = await context.bot.get_file(document.file_id)
+    data = await telegram_file.download_as_bytearray()
+    await send_bulk_document(update, data.decode('utf-8', errors='replace').splitlines())
+
+class Metrics:
+    """Minimal Prometheus-style registry of counters and latency histograms.
+
+    Recording is a dict update (plus a bisect for histograms) so it can sit
+    on the hot path; formatting only happens when /metrics is scraped.
+    """
+
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self):
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [per-bucket counts (last is +Inf), sum]
+
+    def inc(self, name: str, labels: tuple = (), value: float = 1) -> None:
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: tuple, seconds: float) -> None:
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [[0] * (len(self.BUCKETS) + 1), 0.0]
+        histogram[0][bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+
+    @staticmethod
+    def _labels(labels: tuple, extra: str = "") -> str:
+        parts = [f'{key}="{value}"' for key, value in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self, gauges: list = ()) -> str:
+        """Format all metrics, plus (name, labels, value) gauges, in Prometheus text format."""
+        lines = []
+        typed = set()
+        
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+        
+        for (name, labels), value in sorted(self.counters.items()):
+            declare(name, "counter")
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), (counts, total) in sorted(self.histograms.items()):
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                bucket_labels = self._labels(labels, 'le="%s"' % bound)
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{name}_count{self._labels(labels)} {cumulative}")
+        # Sorting keeps each metric family together when several workers report it
+        for name, labels, value in sorted(gauges, key=lambda gauge: gauge[0]):
+            declare(name, "gauge")
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+
+def instrumented(callback):
+    """Wrap a handler callback to record its latency and errors in METRICS."""
+    labels = (("handler", callback.__name__),)
+    
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            METRICS.inc("stylish_bot_handler_errors_total", labels)
+            raise
+        finally:
+            METRICS.observe("stylish_bot_handler_latency_seconds", labels, time.perf_counter() - started)
+    return wrapper
+
+async def count_update(update: Update, context: CallbackContext) -> None:
+    """Count incoming updates by type."""
+    for update_type in Update.ALL_TYPES:
+        if getattr(update, update_type, None) is not None:
+            METRICS.inc("stylish_bot_updates_total", (("type", update_type),))
+            return
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records every Bot API call by method and HTTP status."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        status = "error"
         try:
-            await query.edit_message_text(
-                text=f"✨ Your name: {name}\n\nChoose a style from the buttons below:",
-                reply_markup=create_style_buttons(name, page)
+            status, payload = await super().do_request(url, method, *args, **kwargs)
+            return status, payload
+        finally:
+            METRICS.inc("stylish_bot_api_calls_total", (("method", api_method), ("status", str(status))))
+            METRICS.observe(
+                "stylish_bot_api_latency_seconds", (("method", api_method),), time.perf_counter() - started
             )
+
+# Caches reported on /metrics
+CACHES = {
+    "keyboard": KEYBOARD_CACHE,
+    "result": RESULT_CACHE,
+    "inline": INLINE_CACHE,
+    "users": USERS.cache,
+}
+
+def collect_gauges(application: Application) -> list:
+    """Snapshot cache, queue and dispatcher state as (name, labels, value) gauges."""
+    gauges = []
+    for cache_name, cache in CACHES.items():
+        labels = (("cache", cache_name),)
+        stats = cache.stats()
+        gauges.append(("stylish_bot_cache_size", labels, stats["size"]))
+        gauges.append(("stylish_bot_cache_hits", labels, stats["hits"]))
+        gauges.append(("stylish_bot_cache_misses", labels, stats["misses"]))
+        gauges.append(("stylish_bot_cache_hit_ratio", labels, round(stats["hit_rate"], 4)))
+    gauges.append(("stylish_bot_sessions", (), len(SESSIONS)))
+    processor = application.update_processor
+    if isinstance(processor, ChatOrderedUpdateProcessor):
+        for key, value in processor.stats().items():
+            gauges.append((f"stylish_bot_updates_{key}", (), value))
+    gauges.append(("stylish_bot_update_queue_size", (), application.update_queue.qsize()))
+    for key, value in DISPATCHER.stats().items():
+        gauges.append((f"stylish_bot_outbound_{key}", (), value))
+    gauges.append(("stylish_bot_pending_deletions", (), len(DEFERRED_DELETIONS)))
+    gauges.append(("stylish_bot_user_store_pending_writes", (), USERS.pending()))
+    gauges.append(("stylish_bot_user_store_writes", (), USERS.writes))
+    return gauges
+
+def web_handlers(application: Application, pool: "WorkerPool" = None) -> dict:
+    """Return the web server's request handlers keyed by (method, path).
+
+    With a worker `pool`, /metrics reports the pool and every worker's metrics.
+    """
+    async def hello(request):
+        if LIFECYCLE_STATE == "draining":
+            return web.Response(status=503, text=f"Bot is draining. Instance ID: {BOT_INSTANCE_ID}")
+        return web.Response(text=f"Bot is running! Instance ID: {BOT_INSTANCE_ID}")
+    
+    async def healthz(request):
+        # Liveness: the event loop is answering
+        return web.Response(text="ok")
+    
+    async def readyz(request):
+        # Readiness: updates are being received and handled
+        status = 200 if LIFECYCLE_STATE == "running" else 503
+        return web.json_response(startup_report(), status=status)
+    
+    async def telegram_webhook(request):
+        if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return web.Response(status=403)
+        if LIFECYCLE_STATE == "draining":
+            # Telegram retries failed deliveries, and the next instance keeps pending
+            # updates (drop_pending_updates=False), so this update is not lost
+            return web.Response(status=503)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        # Hand the update to the Application running on this same event loop
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        return web.Response()
+    
+    async def metrics(request):
+        return web.Response(
+            text=pool.render_metrics() if pool else METRICS.render(collect_gauges(application)),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+    
+    return {
+        ("GET", "/"): hello,
+        ("GET", "/healthz"): healthz,
+        ("GET", "/readyz"): readyz,
+        ("POST", WEBHOOK_PATH): telegram_webhook,
+        ("GET", "/metrics"): metrics,
+    }
+
+def create_web_app(application: Application, pool: "WorkerPool" = None) -> web.Application:
+    """Create the aiohttp app serving health checks, metrics and Telegram webhooks."""
+    app = web.Application()
+    for (method, path), handler in web_handlers(application, pool).items():
+        app.router.add_route(method, path, handler)
+    return app
+
+def build_application(token: str, base_url: str = None) -> Application:
+    """Build the Application with all handlers registered.
+
+    `base_url` points the bot at a different Bot API server, e.g. the fake
+    one used by benchmark.py.
+    """
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(ChatOrderedUpdateProcessor(
+            int(os.getenv('MAX_CONCURRENT_UPDATES', 32)),
+            int(os.getenv('MAX_PENDING_UPDATES', 1024)),
+        ))  # Concurrent across chats, sequential within each chat
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .get_updates_request(InstrumentedRequest())
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+
+    # Add handlers
+    application.add_handler(TypeHandler(Update, count_update), group=-1)
+    application.add_handler(CommandHandler("start", instrumented(start)))
+    application.add_handler(CommandHandler("style", instrumented(style)))
+    application.add_handler(CommandHandler("find", instrumented(find)))
+    application.add_handler(CommandHandler("bulk", instrumented(bulk)))
+    application.add_handler(MessageHandler(
+        filters.ChatType.PRIVATE & filters.Document.FileExtension("txt"), instrumented(bulk_document)
+    ))
+    application.add_handler(CallbackQueryHandler(instrumented(button_callback)))
+    application.add_handler(InlineQueryHandler(instrumented(inline_query)))
+    application.add_handler(MessageHandler(
+        filters.UpdateType.EDITED_MESSAGE, instrumented(handle_edited_message)
+    ))
+    return application
+
+_catalog_watcher = None
+_cache_warmer = None
+
+async def warm_caches() -> None:
+    """Compile the catalog and its search index off the event loop before the first request needs them."""
+    with startup_phase("warm_caches"):
+        try:
+            catalog = await asyncio.to_thread(get_catalog)
+            await asyncio.to_thread(catalog.search_index)
         except Exception as e:
-            print(f"Error updating message: {e}")
-            # If edit fails, send a new message
-            await query.message.reply_text(
-                text=f"✨ Your name: {name}\n\nChoose a style from the buttons below:",
-                reply_markup=create_style_buttons(name, page)
+            logger.error(f"Could not warm caches: {e}")
+
+async def start_background_services(application: Application) -> None:
+    """Start the outbound dispatcher, deferred deletions, user store, catalog watcher and cache warming."""
+    global _catalog_watcher, _cache_warmer
+    DISPATCHER.start()
+    DEFERRED_DELETIONS.start(application.bot)
+    USERS.start()
+    if CATALOG_POLL_INTERVAL > 0:
+        _catalog_watcher = asyncio.create_task(watch_catalog())
+    _cache_warmer = asyncio.create_task(warm_caches())
+
+async def stop_background_services() -> None:
+    global _catalog_watcher, _cache_warmer
+    for task in (_catalog_watcher, _cache_warmer):
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    _catalog_watcher = _cache_warmer = None
+    await USERS.stop()
+    await DEFERRED_DELETIONS.stop()
+    await DISPATCHER.stop()
+
+def install_signal_handlers(stop_event: asyncio.Event, pool: "WorkerPool" = None) -> None:
+    """Stop on SIGINT/SIGTERM and reload the style catalog on SIGHUP."""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    loop.add_signal_handler(signal.SIGHUP, pool.reload_catalogs if pool else reload_catalog)
+
+async def run_bot(application: Application, port: int, pool: "WorkerPool" = None) -> None:
+    """Run the bot and the web server together on the current event loop."""
+    stop_event = asyncio.Event()
+    install_signal_handlers(stop_event, pool)
+    
+    with startup_phase("web_server"):
+        runner = web.AppRunner(create_web_app(application, pool))
+        await runner.setup()
+        site = web.TCPSite(runner, '0.0.0.0', port)
+        await site.start()
+    logger.info(f"Web server started successfully on port {port}")
+    
+    try:
+        await serve(application, stop_event, pool)
+    finally:
+        await runner.cleanup()
+
+async def serve(application: Application, stop_event: asyncio.Event, pool: "WorkerPool" = None) -> None:
+    """Start receiving and handling updates, then drain once `stop_event` is set.
+
+    With a worker `pool`, `application` only receives updates (it has no
+    handlers and is never started) and they are routed to the workers.
+    """
+    with startup_phase("initialize"):
+        await application.initialize()
+    try:
+        try:
+            await start_serving(application, pool)
+            await stop_event.wait()
+            logger.info("Received stop signal. Shutting down gracefully.")
+        finally:
+            # Also runs if startup failed part way, so the Application is
+            # stopped before shutdown() and the original error propagates
+            if pool:
+                await pool.drain(application)
+            else:
+                await drain(application)
+    finally:
+        await application.shutdown()
+
+async def start_serving(application: Application, pool: "WorkerPool" = None) -> None:
+    """Start handling updates, then start receiving them by webhook or polling."""
+    with startup_phase("start"):
+        if pool:
+            await pool.start(application)
+        else:
+            await application.start()
+            await start_background_services(application)
+    with startup_phase(BOT_MODE):
+        if BOT_MODE == "webhook":
+            webhook_url = WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH
+            logger.info(f"Setting webhook to {webhook_url}...")
+            await application.bot.set_webhook(
+                url=webhook_url,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+                # Keep what arrived while the previous instance drained
+                drop_pending_updates=False,
+            )
+        else:
+            logger.info("Starting bot polling...")
+            await application.updater.start_polling(
+                drop_pending_updates=False,
+                allowed_updates=Update.ALL_TYPES,
+                pool_timeout=30,  # Shorter pool timeout
+                read_timeout=7,   # Shorter read timeout
+                write_timeout=5,  # Shorter write timeout
+                connect_timeout=5, # Shorter connect timeout
+                poll_interval=1.0 # Shorter poll interval
             )
+    set_lifecycle_state("running")
+    report = startup_report()
+    phases = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in report["phases"].items())
+    logger.info(f"Bot is running in {BOT_MODE} mode. Startup took {report['total']:.3f}s: {phases}")
+
+def set_lifecycle_state(state: str) -> None:
+    global LIFECYCLE_STATE
+    LIFECYCLE_STATE = state
+    logger.info(f"Lifecycle state: {state}")
+
+async def drain(application: Application) -> None:
+    """Finish in-flight work within SHUTDOWN_DEADLINE, then stop the Application.
+
+    Intake stops first (polling ends, webhooks get 503), then in-flight
+    handlers finish, pending deletions are sent, the outbound queue drains
+    and the user store flushes. Anything still pending at the deadline is
+    dropped.
+    """
+    set_lifecycle_state("draining")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SHUTDOWN_DEADLINE
+    
+    if application.updater.running:
+        await application.updater.stop()
+    
+    # Application.stop() processes what is already queued and waits for running handlers
+    if application.running:
+        try:
+            await asyncio.wait_for(application.stop(), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown deadline reached with handlers still running")
+    
+    await DEFERRED_DELETIONS.stop()
+    try:
+        await asyncio.wait_for(DEFERRED_DELETIONS.flush(), max(deadline - loop.time(), 0))
+        await asyncio.wait_for(DISPATCHER.join(), max(deadline - loop.time(), 0))
+    except asyncio.TimeoutError:
+        logger.warning(f"Shutdown deadline reached with outbound calls pending: {DISPATCHER.stats()}")
+    
+    await stop_background_services()
+    logger.info("Drain complete")
+
+# Seconds between worker metrics snapshots and worker liveness checks
+WORKER_STATS_INTERVAL = 1.0
+
+def shard_for(update: Update, size: int) -> int:
+    """Return the worker index for an update.
+
+    Every update of a chat goes to the same worker, which keeps the chat's
+    updates in order. Updates without a chat use the user's id, which equals
+    their private chat's id, so a user's inline queries land on the same
+    worker as their private chat.
+    """
+    if update.effective_chat:
+        key = update.effective_chat.id
+    elif update.effective_user:
+        key = update.effective_user.id
+    else:
+        key = update.update_id
+    return key % size
+
+def build_ingress_application(token: str, base_url: str = None) -> Application:
+    """Build a handler-less Application that only receives updates for the worker pool."""
+    builder = (
+        Application.builder()
+        .token(token)
+        .request(InstrumentedRequest())
+        .get_updates_request(InstrumentedRequest())
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    return builder.build()
+
+class WorkerPool:
+    """Fans updates out to worker processes, sharded by chat.
+
+    Each worker runs the full bot (handlers, caches, outbound dispatcher) on
+    its own core and receives update JSON over its own multiprocessing
+    queue. Workers send metrics snapshots back once a second. A worker that
+    dies is restarted with fresh queues; updates it had not finished are
+    lost, as they would be if a single-process bot crashed.
+    """
+
+    def __init__(self, token: str, size: int, base_url: str = None):
+        self.token = token
+        self.size = size
+        self.base_url = base_url
+        # The Bot API limit is per bot, so the workers share it
+        self.global_rate = float(os.getenv('GLOBAL_SEND_RATE', 30)) / size
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = [None] * size
+        self._updates = [None] * size
+        self._stats = [None] * size
+        self._snapshots = [None] * size
+        self.dispatched = [0] * size
+        self.restarts = [0] * size
+        self._router = None
+        self._monitor = None
+        self._stopping = False
+
+    def _spawn(self, index: int) -> None:
+        # A worker that died mid-read leaves its queue's lock held, so every
+        # (re)start gets new queues
+        for old in (self._updates[index], self._stats[index]):
+            if old is not None:
+                old.close()
+                old.cancel_join_thread()
+        self._updates[index] = self._context.Queue()
+        self._stats[index] = self._context.Queue()
+        process = self._context.Process(
+            target=run_worker,
+            args=(index, self.token, self.base_url, self.global_rate,
+                  self._updates[index], self._stats[index], os.getpid()),
+            name=f"stylish-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        logger.info(f"Started worker {index} (pid {process.pid})")
+
+    async def start(self, application: Application) -> None:
+        """Spawn the workers and start routing `application`'s incoming updates."""
+        for index in range(self.size):
+            self._spawn(index)
+        self._router = asyncio.create_task(self._route(application))
+        self._monitor = asyncio.create_task(self._watch())
+
+    def dispatch(self, update: Update) -> None:
+        index = shard_for(update, self.size)
+        self._updates[index].put(update.to_dict())
+        self.dispatched[index] += 1
+
+    async def _route(self, application: Application) -> None:
+        update_queue = application.update_queue
+        while True:
+            update = await update_queue.get()
+            try:
+                self.dispatch(update)
+            except Exception as e:
+                logger.error(f"Could not dispatch update {update.update_id}: {e}")
+            finally:
+                update_queue.task_done()
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(WORKER_STATS_INTERVAL)
+            self._collect_snapshots()
+            for index, process in enumerate(self._processes):
+                if not process.is_alive() and not self._stopping:
+                    lost = self._updates[index].qsize()
+                    logger.error(
+                        f"Worker {index} (pid {process.pid}) exited with code {process.exitcode}; "
+                        f"restarting, {lost} queued updates lost"
+                    )
+                    self.restarts[index] += 1
+                    self._snapshots[index] = None
+                    self._spawn(index)
+
+    def _collect_snapshots(self) -> None:
+        for index, stats_queue in enumerate(self._stats):
+            while True:
+                try:
+                    self._snapshots[index] = stats_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+    def reload_catalogs(self) -> None:
+        """Forward SIGHUP so every worker reloads the style catalog."""
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                os.kill(process.pid, signal.SIGHUP)
+
+    async def drain(self, application: Application) -> None:
+        """Stop intake, hand queued updates to the workers and wait for them to drain."""
+        set_lifecycle_state("draining")
+        self._stopping = True
+        if application.updater.running:
+            await application.updater.stop()
+        try:
+            await asyncio.wait_for(application.update_queue.join(), SHUTDOWN_DEADLINE)
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown deadline reached with updates not yet routed")
+        # Startup may have failed before every task and worker existed
+        tasks = [task for task in (self._router, self._monitor) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        processes = [process for process in self._processes if process is not None]
+        
+        # Workers finish what they were sent, then run their own drain
+        for updates in self._updates:
+            if updates is not None:
+                updates.put(None)
+        grace = SHUTDOWN_DEADLINE + 5
+        await asyncio.gather(*(asyncio.to_thread(process.join, grace) for process in processes))
+        for index, process in enumerate(self._processes):
+            if process is not None and process.is_alive():
+                logger.warning(f"Worker {index} did not stop in time; terminating it")
+                process.terminate()
+        logger.info(f"Worker pool stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "alive": sum(process is not None and process.is_alive() for process in self._processes),
+            "dispatched": sum(self.dispatched),
+            "restarts": sum(self.restarts),
+        }
+
+    def render_metrics(self) -> str:
+        """Merge the ingress metrics with each worker's latest snapshot, labelled by worker."""
+        self._collect_snapshots()
+        merged = Metrics()
+        merged.counters.update(METRICS.counters)
+        merged.histograms.update(METRICS.histograms)
+        gauges = []
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            worker = (("worker", str(index)),)
+            gauges.append(("stylish_bot_worker_up", worker, int(process.is_alive())))
+            gauges.append(("stylish_bot_worker_dispatched", worker, self.dispatched[index]))
+            gauges.append(("stylish_bot_worker_restarts", worker, self.restarts[index]))
+            gauges.append(("stylish_bot_worker_queue_size", worker, self._updates[index].qsize()))
+            snapshot = self._snapshots[index]
+            if snapshot is None:
+                continue
+            counters, histograms, worker_gauges = snapshot
+            for (name, labels), value in counters.items():
+                merged.counters[(name, worker + labels)] = value
+            for (name, labels), histogram in histograms.items():
+                merged.histograms[(name, worker + labels)] = histogram
+            for name, labels, value in worker_gauges:
+                gauges.append((name, worker + labels, value))
+        return merged.render(gauges)
+
+def run_worker(index: int, token: str, base_url: str, global_rate: float,
+               updates, stats, parent_pid: int) -> None:
+    """Entry point of a worker process."""
+    global DISPATCHER
+    # Stop signals go to the ingress, which drains the workers in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    DISPATCHER = OutboundDispatcher(
+        global_rate=global_rate,
+        private_rate=DISPATCHER.private_rate,
+        group_rate=DISPATCHER.group_rate,
+        group_burst=DISPATCHER.group_burst,
+    )
+    asyncio.run(serve_worker(index, token, base_url, updates, stats, parent_pid))
+
+async def serve_worker(index: int, token: str, base_url: str, updates, stats, parent_pid: int) -> None:
+    """Feed updates from the ingress queue into a full Application until told to stop."""
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGHUP, reload_catalog)
+    stop_event = asyncio.Event()
+    application = build_application(token, base_url)
+    
+    async def enqueue(data):
+        await application.update_queue.put(Update.de_json(data, application.bot))
+    
+    def read_updates():
+        # Blocking reads run on their own thread; putting into update_queue
+        # waits for the coroutine, so a busy worker backs up its own queue
+        while True:
+            data = updates.get()
+            if data is None:
+                break
+            asyncio.run_coroutine_threadsafe(enqueue(data), loop).result()
+        loop.call_soon_threadsafe(stop_event.set)
+    
+    async with application:
+        await application.start()
+        await start_background_services(application)
+        threading.Thread(target=read_updates, name="update-reader", daemon=True).start()
+        set_lifecycle_state("running")
+        logger.info(f"Worker {index} ready (pid {os.getpid()})")
+        
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), WORKER_STATS_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            if os.getppid() != parent_pid:
+                logger.error(f"Worker {index}: ingress process is gone, stopping")
+                break
+            histograms = {key: (counts[:], total) for key, (counts, total) in METRICS.histograms.items()}
+            stats.put((dict(METRICS.counters), histograms, collect_gauges(application)))
+        
+        await drain(application)
+    logger.info(f"Worker {index} stopped")
+
+def create_bot():
+    """Check the configuration and build the Application (and worker pool).
+
+    Returns (application, pool), with pool None in single-process mode, or
+    None if the configuration is incomplete.
+    """
+    # Create the Application and pass it your bot's token
+    token = os.getenv('TELEGRAM_BOT_TOKEN')
+    if not token:
+        logger.error("Error: TELEGRAM_BOT_TOKEN not found in environment variables")
+        return None
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        logger.error("Error: BOT_MODE is webhook but WEBHOOK_URL is not set")
+        return None
+
+    logger.info(f"Bot instance started with ID: {BOT_INSTANCE_ID}")
+    logger.info("Bot token loaded successfully")
+    logger.info("Initializing bot...")
+    
+    with startup_phase("build"):
+        if WORKERS > 1:
+            application = build_ingress_application(token)
+            pool = WorkerPool(token, WORKERS)
+            logger.info(f"Ingress built, handing updates to {WORKERS} worker processes")
+        else:
+            application = build_application(token)
+            pool = None
+            logger.info("Application built successfully")
+    return application, pool
 
 def main():
     """Main entry point for the application."""
@@ -334,84 +2316,17 @@ def main():
             logger.error("Another bot instance is already running. Exiting.")
             return
 
-        # Create the Application and pass it your bot's token
-        token = os.getenv('TELEGRAM_BOT_TOKEN')
-        if not token:
-            logger.error("Error: TELEGRAM_BOT_TOKEN not found in environment variables")
+        created = create_bot()
+        if created is None:
             return
-
-        logger.info(f"Bot instance started with ID: {BOT_INSTANCE_ID}")
-        logger.info("Bot token loaded successfully")
-        logger.info("Initializing bot...")
+        application, pool = created
         
-        # Create application with custom settings to prevent conflicts
-        application = (
-            Application.builder()
-            .token(token)
-            .concurrent_updates(False)  # Process updates sequentially
-            .build()
-        )
-        logger.info("Application built successfully")
-
-        # Define shutdown handler
-        def shutdown_handler(signum, frame):
-            logger.info(f"Received signal {signum}. Shutting down gracefully.")
-            remove_lock()
-            sys.exit(0)
-            
-        # Register signal handlers for graceful shutdown
-        signal.signal(signal.SIGINT, shutdown_handler)
-        signal.signal(signal.SIGTERM, shutdown_handler)
-
-        # Add handlers
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(CommandHandler("style", style))
-        application.add_handler(CallbackQueryHandler(button_callback))
-        application.add_handler(MessageHandler(filters.UpdateType.EDITED_MESSAGE, handle_edited_message))
-        logger.info("Handlers added successfully")
-        
-        # Start the web server in a separate thread
+        # The web server shares the bot's event loop: it answers health checks
+        # and, in webhook mode, receives updates from Telegram
         port = int(os.getenv('PORT', 8080))
         logger.info(f"Starting web server on port {port}...")
-        
-        # Setup web app
-        app = web.Application()
-        routes = web.RouteTableDef()
-        
-        @routes.get('/')
-        async def hello(request):
-            return web.Response(text=f"Bot is running! Instance ID: {BOT_INSTANCE_ID}")
-        
-        app.add_routes(routes)
-        
-        # Run web server in a separate thread
-        import threading
-        def run_web_server():
-            web_loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(web_loop)
-            runner = web.AppRunner(app)
-            web_loop.run_until_complete(runner.setup())
-            site = web.TCPSite(runner, '0.0.0.0', port)
-            web_loop.run_until_complete(site.start())
-            logger.info(f"Web server started successfully on port {port}")
-            web_loop.run_forever()
-            
-        webserver_thread = threading.Thread(target=run_web_server)
-        webserver_thread.daemon = True
-        webserver_thread.start()
-        
-        # Run the bot with specific ID to prevent conflicts
-        logger.info("Starting bot polling...")
-        application.run_polling(
-            drop_pending_updates=True,
-            allowed_updates=Update.ALL_TYPES,
-            pool_timeout=30,  # Shorter pool timeout
-            read_timeout=7,   # Shorter read timeout
-            write_timeout=5,  # Shorter write timeout
-            connect_timeout=5, # Shorter connect timeout
-            poll_interval=1.0 # Shorter poll interval
-        )
-        logger.info("Bot polling stopped")
+        asyncio.run(run_bot(application, port, pool))
+        logger.info("Bot stopped")
     
     except KeyboardInterrupt:
         logger.info("Application stopped by user")
@@ -422,4 +2337,4 @@ def main():
         remove_lock()  # Ensure lock is removed
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()